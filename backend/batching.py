@@ -0,0 +1,73 @@
+import asyncio
+import numpy as np
+
+
+class QueryBatcher:
+    """
+    Coalesces concurrent /query requests into one embedding forward pass
+    and one batched index search.
+
+    Queries are queued for up to `max_wait_ms` (or until `max_batch_size`
+    queries are waiting), then encoded and searched together in a worker
+    thread so the event loop is never blocked by the model or FAISS.
+    """
+
+    def __init__(self, encode_fn, search_fn, max_batch_size=32, max_wait_ms=5):
+        self.encode_fn = encode_fn
+        self.search_fn = search_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self.worker = None
+
+    def _ensure_worker(self):
+        if self.worker is None or self.worker.done():
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, query, k):
+        """
+        Queue a query and wait for its (distances, ids, embedding) row.
+        With k=0 the query is only encoded.
+        """
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((query, k, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _process(self, queries, k):
+        vectors = np.asarray(self.encode_fn(queries), dtype="float32")
+        if k == 0:  # encode-only batch (e.g. filtered searches run their own search)
+            empty = np.zeros((len(queries), 0))
+            return vectors, empty, empty.astype("int64")
+        D, I = self.search_fn(vectors, k)
+        return vectors, D, I
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            queries = [query for query, _, _ in batch]
+            k = max(k for _, k, _ in batch)
+            try:
+                vectors, D, I = await asyncio.to_thread(self._process, queries, k)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for row, (_, k_row, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result((D[row, :k_row], I[row, :k_row], vectors[row]))
@@ -0,0 +1,89 @@
+import hashlib
+import re
+import threading
+from cachetools import TTLCache
+
+
+def normalize_query(query):
+    """
+    Collapse case and whitespace so trivially different spellings of the
+    same query share cache entries.
+    """
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+def vector_key(vector, k):
+    return hashlib.sha1(vector.tobytes()).hexdigest() + f":{k}"
+
+
+def text_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class StatsCache:
+    """
+    Bounded LRU + TTL cache with hit/miss counters. Thread-safe, since
+    entries are written from both the event loop and worker threads.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.cache.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.cache[key] = value
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.cache),
+                "maxsize": self.cache.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+class QueryCache:
+    """
+    Layered /query cache: normalized query -> embedding,
+    embedding -> top-K (similarities, ids), and prompt hash -> LLM answer.
+    """
+
+    def __init__(self, maxsize=4096, ttl=3600, answer_ttl=600):
+        self.embeddings = StatsCache(maxsize, ttl)
+        self.retrievals = StatsCache(maxsize, ttl)
+        self.answers = StatsCache(maxsize, answer_ttl)
+
+    def invalidate(self):
+        """
+        Drop everything derived from the loaded index / metadata. Query
+        embeddings go too: whether they are normalized depends on the index.
+        """
+        self.embeddings.clear()
+        self.retrievals.clear()
+        self.answers.clear()
+
+    def stats(self):
+        return {
+            "embeddings": self.embeddings.stats(),
+            "retrievals": self.retrievals.stats(),
+            "answers": self.answers.stats()
+        }
@@ -0,0 +1,65 @@
+import asyncio
+from groq import AsyncGroq
+
+SYSTEM_PROMPT = "You are a fairness-aware knowledge assistant."
+
+
+class LLMClient:
+    """
+    Async Groq chat client with a bounded number of in-flight completions
+    and a per-call timeout, so a slow completion never stalls other requests.
+    """
+
+    def __init__(self, api_key, model, max_concurrency=8, timeout=60.0,
+                 temperature=0.7, max_tokens=1000):
+        self.client = AsyncGroq(api_key=api_key, timeout=timeout)
+        self.model = model
+        self.timeout = timeout
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _messages(self, prompt):
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    async def complete(self, prompt):
+        async with self.semaphore:
+            response = await asyncio.wait_for(
+                self.client.chat.completions.create(
+                    model=self.model,
+                    messages=self._messages(prompt),
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens
+                ),
+                self.timeout
+            )
+        return response.choices[0].message.content
+
+    async def stream(self, prompt):
+        """
+        Yield answer tokens as they arrive. The timeout applies to the
+        wait for each chunk, not to the whole answer.
+        """
+        async with self.semaphore:
+            stream = await asyncio.wait_for(
+                self.client.chat.completions.create(
+                    model=self.model,
+                    messages=self._messages(prompt),
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True
+                ),
+                self.timeout
+            )
+            chunks = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    break
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
@@ -1,51 +1,195 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import Literal
 import faiss
 import json
+import os
+import sys
 import numpy as np
 from sentence_transformers import SentenceTransformer
-from groq import Groq  # Changed to Groq
+import asyncio
+import groq
+from batching import QueryBatcher
+from llm import LLMClient
+from cache import QueryCache, normalize_query, vector_key, text_key
+from payload import SphereStore
+from record_store import RecordStore
+from rerank import fair_rerank
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+from embedding_cache import EmbeddingCache  # shared with the data pipeline
+from bm25 import BM25Index
+from index_builder import (index_metric, load_params, normalizes_queries, normalize_rows,
+                           cosine_scores, index_ids, vectors_path, exact_rerank, filtered_search)
 
 # -------------------------
 # CONFIG
 # -------------------------
 FAISS_INDEX_FILE = "faiss_index/equinet_faiss.index"
+INDEX_PARAMS_FILE = FAISS_INDEX_FILE + ".params.json"  # written by data/index_builder.py
+INDEX_MMAP = True  # mmap the index read-only so workers share it via the page cache
+EXACT_RERANK_OVERFETCH = 4  # compressed indexes: candidates re-scored exactly per result
+POST_FILTER_OVERFETCH = 2  # filtered searches on index types without selector support (pq)
 METADATA_FILE = "faiss_index/output.json"
+SPHERE_FILE = "faiss_index/output.json"
+SPHERE_COORDS_FILE = "sphere_coords.bin"  # written by sphere-data.py
+CLUSTER_STATS_FILE = "faiss_index/cluster_stats.json"  # written by data/clustering.py
+BM25_FILE = "faiss_index/equinet_bm25.npz"  # written by data/weighting.py
 EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 TOP_K = 5
+GROUP_OVERFETCH = 4  # passages fetched per requested document when grouping
+RERANK_OVERFETCH = 5  # candidates fetched per result when fairness re-ranking
+HYBRID_OVERFETCH = 3  # candidates fetched per result from each ranker before fusion
+RRF_K = 60  # reciprocal rank fusion constant
+BATCH_MAX_SIZE = 32  # max queries encoded in one forward pass
+BATCH_MAX_WAIT_MS = 5  # how long to hold a query waiting for others
+LLM_MODEL = "moonshotai/Kimi-K2-Instruct-0905"  # or "mixtral-8x7b-32768", "llama-3.3-70b-versatile"
+LLM_MAX_CONCURRENCY = 8  # in-flight Groq completions per worker
+LLM_TIMEOUT = 60.0  # seconds
+CACHE_MAX_ENTRIES = 4096  # per cache layer
+CACHE_TTL = 3600  # seconds, embedding + retrieval layers
+ANSWER_CACHE_TTL = 600  # seconds, LLM answers
 
 # Initialize Groq client
-client = Groq(api_key="")
+client = LLMClient(api_key="", model=LLM_MODEL,
+                   max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT)
 
 # -------------------------
 # LOAD INDEX + METADATA
 # -------------------------
-print("[INFO] Loading FAISS index...")
-index = faiss.read_index(FAISS_INDEX_FILE)
-with open(METADATA_FILE, "r", encoding="utf-8") as f:
-    metadata = json.load(f)
-print(f"[INFO] Loaded {len(metadata)} metadata entries.")
+index = None
+index_params = {}
+rerank_vectors = None
+metadata = []
+bm25 = None
+query_cache = QueryCache(CACHE_MAX_ENTRIES, CACHE_TTL, ANSWER_CACHE_TTL)
+sphere_store = SphereStore(SPHERE_FILE)
+
+def load_index_params():
+    """
+    Apply the search-time parameters (nprobe / efSearch) saved next to
+    the index. Flat indexes have no params file and need none.
+    """
+    params = load_params(FAISS_INDEX_FILE)
+    if not os.path.exists(INDEX_PARAMS_FILE):
+        return params
+    space = faiss.ParameterSpace()
+    for name in ("nprobe", "efSearch"):
+        if name in params:
+            space.set_index_parameter(index, name, params[name])
+    print(f"[INFO] Index type {params.get('index_type')}, search params applied.")
+    return params
+
+def mmap_flags():
+    """
+    IO_FLAG_MMAP only maps IVF inverted lists; flat / HNSW / SQ / PQ codes
+    need IO_FLAG_MMAP_IFC to stay out of each worker's heap.
+    """
+    index_type = load_params(FAISS_INDEX_FILE).get("index_type", "flat")
+    flags = [faiss.IO_FLAG_MMAP]
+    if index_type not in ("ivf", "ivfpq") and hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        flags.insert(0, faiss.IO_FLAG_MMAP_IFC)
+    return flags
+
+def read_index():
+    if INDEX_MMAP:
+        for flag in mmap_flags():
+            try:
+                return faiss.read_index(FAISS_INDEX_FILE, flag | faiss.IO_FLAG_READ_ONLY)
+            except (AttributeError, RuntimeError) as e:
+                # Not every index type / FAISS build supports mmap
+                print(f"[WARNING] mmap load failed ({e}).")
+        print("[WARNING] Reading index into memory.")
+    return faiss.read_index(FAISS_INDEX_FILE)
+
+def load_corpus():
+    """
+    (Re)load the FAISS index and metadata. Metadata is a memory-mapped
+    RecordStore whose id lookup always matches the loaded records.
+    """
+    global index, index_params, rerank_vectors, metadata, bm25
+    print("[INFO] Loading FAISS index...")
+    index = read_index()
+    index_params = load_index_params()
+    check_scorable(index, index_params)
+    rerank_vectors = None
+    if index_params.get("compressed") and os.path.exists(vectors_path(FAISS_INDEX_FILE)):
+        # Full-precision vectors stay on disk; only re-ranked rows are paged in
+        rerank_vectors = np.load(vectors_path(FAISS_INDEX_FILE), mmap_mode="r")
+        print(f"[INFO] Exact re-ranking of compressed {index_params['index_type']} candidates enabled.")
+    metadata = RecordStore(METADATA_FILE)
+    bm25 = BM25Index.load(BM25_FILE) if os.path.exists(BM25_FILE) else None
+    query_cache.invalidate()
+    print(f"[INFO] Loaded {len(metadata)} metadata entries.")
+
+def check_scorable(index, params):
+    """
+    Legacy L2 indexes hold unnormalized vectors, so cosine scores need the
+    hit vectors back; refuse to serve an index that can't reconstruct them.
+    """
+    if index_metric(params) == "ip" or params.get("unit_vectors") or not index.ntotal:
+        return
+    try:
+        index.reconstruct(int(index_ids(index)[0]))
+    except RuntimeError:
+        raise RuntimeError(f"{FAISS_INDEX_FILE} is a legacy L2 index without reconstruction support; "
+                           "rebuild it with data/ingest.py --rebuild")
+    print("[INFO] Legacy L2 index: raw queries, cosine scores from reconstructed vectors.")
+
+load_corpus()
 
 def get_snippet_from_db(snippet_id: str):
     """
     Retrieve a snippet by its ID from the loaded data.
-    Returns None if not found.
+    Returns None if not found or deleted by incremental ingestion.
     """
-    for snippet in metadata:
-        if snippet.get('id') == snippet_id:
-            return snippet
-    return None
+    snippet = metadata.get_by_id(snippet_id)
+    if snippet is None or snippet.get("deleted"):
+        return None
+    return snippet
 
 # -------------------------
 # EMBEDDING MODEL
 # -------------------------
 model = SentenceTransformer(EMBEDDING_MODEL)
+embedding_cache = EmbeddingCache(EMBEDDING_MODEL, "query-v1")  # raw model output
+
+def encode_queries(queries):
+    # Normalized only for indexes built over unit vectors; legacy L2 indexes
+    # were searched with raw query vectors
+    vectors = embedding_cache.encode(model, queries, batch_size=BATCH_MAX_SIZE, show_progress_bar=False)
+    return normalize_rows(vectors) if normalizes_queries(index_params) else vectors
+
+def search_index(vectors, k, filters=None):
+    """
+    Batched index search. `filters` ({field: [values]}) are pushed into the
+    search as an id bitmap built from the metadata's inverted indexes, so
+    k matching results come back without over-fetching. Candidates from a
+    compressed index are re-scored against the full-precision vectors.
+    D holds cosine similarities whatever the index metric.
+    """
+    if rerank_vectors is None:
+        D, I = search_faiss(vectors, k, filters)
+    else:
+        _, I = search_faiss(vectors, k * EXACT_RERANK_OVERFETCH, filters)
+        D, I = exact_rerank(vectors, I, rerank_vectors, k, index_metric(index_params))
+    return cosine_scores(vectors, D, I, index_params, index), I
+
+def search_faiss(vectors, k, filters=None):
+    # Look up the global on every call so /reload is picked up
+    mask = metadata.filter_mask(filters) if filters else None
+    if mask is None:
+        return index.search(vectors, k)
+    return filtered_search(index, index_params, vectors, k, mask, POST_FILTER_OVERFETCH)
+
+batcher = QueryBatcher(encode_queries, search_index, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
 
 # -------------------------
 # FASTAPI APP
 # -------------------------
 app = FastAPI()
+reload_lock = asyncio.Lock()
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -54,60 +198,269 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class RerankOptions(BaseModel):
+    fairness_weight: float = 0.3  # 0 = pure similarity, 1 = pure fairness score
+    diversity_weight: float = 0.2  # penalty per already-picked result from the same cluster
+    max_per_cluster: int | None = None  # hard quota per cluster
+
+class SearchFilters(BaseModel):
+    language: list[str] | None = None
+    domain: list[str] | None = None
+    source: list[str] | None = None
+    cluster: list[int] | None = None
+    group: list[str] | None = None
+
 class QueryRequest(BaseModel):
     query: str
+    filters: SearchFilters | None = None  # applied inside the vector search
+    group_documents: bool = False  # collapse passage hits into their parent documents
+    rerank: RerankOptions | None = None  # fairness / diversity re-ranking of over-fetched candidates
+    mode: Literal["dense", "lexical", "hybrid"] = "dense"  # hybrid = BM25 + dense, reciprocal rank fusion
+    min_similarity: float | None = None  # drop dense candidates below this cosine similarity
 
-@app.post("/query")
-async def query_equinet(req: QueryRequest):
-    query_embedding = model.encode([req.query], show_progress_bar=False)
-    query_vector = np.array(query_embedding, dtype="float32")
-    
-    # Retrieve top-K
-    D, I = index.search(query_vector, TOP_K)
-    results = []
-    for i, score in zip(I[0], D[0]):
-        entry = metadata[i]
-        fairness_score = entry.get("fairness_score", 1.0)
-        print(entry)
-        results.append({
+class InfoBatchRequest(BaseModel):
+    ids: list[str]
+
+async def search_cached(query, k, filters=None):
+    """
+    Top-k (similarities, ids) for a query, going through the embedding and
+    retrieval caches before falling back to the batched encoder.
+    """
+    filters = {name: sorted(map(str, values)) for name, values in (filters or {}).items() if values}
+    filter_key = json.dumps(filters, sort_keys=True) if filters else ""
+    query_key = normalize_query(query)
+    vector = query_cache.embeddings.get(query_key)
+    if vector is None:
+        if not filters:
+            # Encoded and searched together with concurrent queries
+            D, I, vector = await batcher.submit(query_key, k)
+            query_cache.embeddings.set(query_key, vector)
+            query_cache.retrievals.set(vector_key(vector, k), (D, I))
+            return D, I
+        # Filtered searches only share the batched encoder, not the search
+        _, _, vector = await batcher.submit(query_key, 0)
+        query_cache.embeddings.set(query_key, vector)
+
+    key = vector_key(vector, k) + filter_key
+    hit = query_cache.retrievals.get(key)
+    if hit is not None:
+        return hit
+    D, I = await asyncio.to_thread(search_index, vector[None, :], k, filters)
+    query_cache.retrievals.set(key, (D[0], I[0]))
+    return D[0], I[0]
+
+def format_hit(entry, score):
+    return {
+        "id": entry["id"],
+        "text": entry["text"],
+        "source": entry.get("source"),
+        "domain": entry.get("domain"),
+        "language": entry.get("language"),
+        "cluster": entry.get("cluster"),
+        "fairness_score": entry.get("fairness_score", 1.0),
+        "similarity": None if score is None else float(score)
+    }
+
+def group_hits(hits, k):
+    """
+    Collapse passage hits (best first) into at most k parent documents,
+    keeping the best passage's fields and listing every matching passage.
+    """
+    documents = {}
+    for entry, hit in hits:
+        parent = entry.get("parent_id", entry["id"])
+        if parent not in documents:
+            if len(documents) == k:
+                continue
+            documents[parent] = {**hit, "parent_id": parent, "passages": []}
+        documents[parent]["passages"].append({
             "id": entry["id"],
-            "text": entry["text"],
-            "source": entry.get("source"),
-            "domain": entry.get("domain"),
-            "language": entry.get("language"),
-            "cluster": entry.get("cluster"),
-            "fairness_score": fairness_score,
-            "similarity": float(score)
+            "chunk_index": entry.get("chunk_index"),
+            "char_start": entry.get("char_start"),
+            "char_end": entry.get("char_end"),
+            "similarity": hit["similarity"]
         })
-    print(results)
-    
+    return list(documents.values())
+
+def rrf_fuse(rankings, k):
+    """
+    Reciprocal rank fusion of several best-first id arrays.
+    Returns (ids, fused scores), best first.
+    """
+    fused = {}
+    for ids in rankings:
+        for rank, i in enumerate(ids.tolist()):
+            fused[i] = fused.get(i, 0.0) + 1.0 / (RRF_K + rank + 1)
+    top = sorted(fused, key=fused.get, reverse=True)[:k]
+    return np.array(top, dtype=np.int64), np.array([fused[i] for i in top], dtype=np.float32)
+
+async def retrieve(query, group_documents=False, rerank=None, filters=None, mode="dense", min_similarity=None):
+    k = TOP_K * GROUP_OVERFETCH if group_documents else TOP_K
+    n = k * RERANK_OVERFETCH if rerank else k
+    if mode != "dense" and bm25 is None:
+        raise HTTPException(status_code=400, detail="Lexical index not available")
+
+    dense_scores, extra = {}, {}
+    if mode in ("dense", "hybrid"):
+        D, I = await search_cached(query, n * HYBRID_OVERFETCH if mode == "hybrid" else n, filters)
+        live = I >= 0  # fewer than k live vectors leaves -1 slots
+        if min_similarity is not None:
+            live &= D >= min_similarity
+        D, I = D[live], I[live]
+        dense_scores = dict(zip(I.tolist(), D.tolist()))
+    if mode in ("lexical", "hybrid"):
+        mask = metadata.filter_mask(filters) if filters else None
+        S, L = bm25.search(query, n * HYBRID_OVERFETCH if mode == "hybrid" else n, mask)
+        extra = {i: {"bm25_score": float(s)} for i, s in zip(L.tolist(), S.tolist())}
+
+    # `ranking` is higher-is-better relevance for the re-ranker
+    if mode == "dense":
+        ranking = D
+    elif mode == "lexical":
+        I, ranking = L, S
+    else:
+        I, fused = rrf_fuse([I, L], n)
+        ranking = fused
+        for i, score in zip(I.tolist(), fused.tolist()):
+            extra.setdefault(i, {})["rrf_score"] = score
+
+    rerank_scores = None
+    if rerank:
+        order, rerank_scores = fair_rerank(
+            I, ranking, metadata.column("fairness_score"), metadata.column("cluster"), k,
+            rerank.fairness_weight, rerank.diversity_weight, rerank.max_per_cluster
+        )
+        I = I[order]
+    else:
+        I = I[:k]
+
+    hits = []
+    for n_hit, i in enumerate(I.tolist()):
+        entry = metadata[i]
+        hit = format_hit(entry, dense_scores.get(i))
+        hit.update(extra.get(i, {}))
+        if rerank_scores is not None:
+            hit["rerank_score"] = float(rerank_scores[n_hit])
+        hits.append((entry, hit))
+    if group_documents:
+        return group_hits(hits, TOP_K)
+    return [hit for _, hit in hits]
+
+def build_prompt(query, results):
+    context = "\n\n".join([r["text"] + ": " + r["source"] for r in results])
+    return f"Based on the following context:\n{context}\n\nAnswer: {query}"
+
+@app.post("/query")
+async def query_equinet(req: QueryRequest):
+    filters = req.filters.model_dump() if req.filters else None
+    results = await retrieve(req.query, req.group_documents, req.rerank, filters, req.mode,
+                             req.min_similarity)
+
     # Pass retrieved context to LLM
-    context = "\n\n".join([metadata[i]["text"] + ": " + metadata[i]["source"] for i in I[0]])
-    prompt = f"Based on the following context:\n{context}\n\nAnswer: {req.query}"
-    
-    # Groq API call
-    llm_response = client.chat.completions.create(
-        model="moonshotai/Kimi-K2-Instruct-0905",  # or "mixtral-8x7b-32768", "llama-3.3-70b-versatile"
-        messages=[
-            {"role": "system", "content": "You are a fairness-aware knowledge assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.7,
-        max_tokens=1000
-    )
-    
-    answer = llm_response.choices[0].message.content
-    
+    prompt = build_prompt(req.query, results)
+    answer = query_cache.answers.get(text_key(prompt))
+    if answer is None:
+        try:
+            answer = await client.complete(prompt)
+        except (asyncio.TimeoutError, groq.APITimeoutError):
+            raise HTTPException(status_code=504, detail="LLM request timed out")
+        except groq.APIError as e:
+            print(f"[ERROR] LLM request failed: {e}")
+            raise HTTPException(status_code=502, detail="LLM request failed")
+        query_cache.answers.set(text_key(prompt), answer)
+
     return {
         "query": req.query,
         "results": results,
         "answer": answer
     }
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/query/stream")
+async def query_equinet_stream(req: QueryRequest):
+    """
+    Server-sent events: one `results` event as soon as retrieval finishes,
+    then `token` events while the answer streams, then `done` (or `error`
+    if the LLM call fails).
+    """
+    filters = req.filters.model_dump() if req.filters else None
+    results = await retrieve(req.query, req.group_documents, req.rerank, filters, req.mode,
+                             req.min_similarity)
+
+    async def events():
+        yield sse_event("results", {"query": req.query, "results": results})
+        prompt = build_prompt(req.query, results)
+        answer = query_cache.answers.get(text_key(prompt))
+        if answer is not None:
+            yield sse_event("token", answer)
+            yield sse_event("done", None)
+            return
+        tokens = []
+        try:
+            async for token in client.stream(prompt):
+                tokens.append(token)
+                yield sse_event("token", token)
+        except (asyncio.TimeoutError, groq.APITimeoutError):
+            yield sse_event("error", "LLM request timed out")
+            return
+        except groq.APIError as e:
+            print(f"[ERROR] LLM request failed: {e}")
+            yield sse_event("error", "LLM request failed")
+            return
+        query_cache.answers.set(text_key(prompt), "".join(tokens))
+        yield sse_event("done", None)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
 @app.get("/get-all")
-async def sphere_data():
-    with open("faiss_index/output.json", "r", encoding="utf-8") as f:
-        return json.load(f)
+async def sphere_data(request: Request, fields: str | None = None,
+                      offset: int = 0, limit: int | None = None):
+    """
+    Full sphere dataset as pre-encoded JSON. `fields` (comma separated)
+    projects each record; `offset`/`limit` paginate and wrap the records
+    as {"total", "offset", "items"}. Supports If-None-Match and gzip/br.
+    """
+    if offset < 0 or (limit is not None and limit < 0):
+        raise HTTPException(status_code=400, detail="offset and limit must be non-negative")
+    field_list = [f for f in fields.split(",") if f] if fields else None
+    payload = await asyncio.to_thread(sphere_store.get, field_list, offset, limit)
+
+    headers = {"ETag": payload.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == payload.etag:
+        return Response(status_code=304, headers=headers)
+    body, encoding = payload.encoded(request.headers.get("accept-encoding"))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/sphere-coords")
+async def sphere_coords():
+    """
+    Quantized 3D sphere layout in the binary format described in
+    sphere-data.py. FileResponse sets ETag / Last-Modified.
+    """
+    if not os.path.exists(SPHERE_COORDS_FILE):
+        raise HTTPException(status_code=404, detail="Sphere layout not generated")
+    return FileResponse(SPHERE_COORDS_FILE, media_type="application/octet-stream",
+                        headers={"Cache-Control": "no-cache"})
+
+def format_snippet(snippet):
+    return {
+        "id": snippet["id"],
+        "source": snippet.get("source"),
+        "domain": snippet.get("domain"),
+        "language": snippet.get("language"),
+        "text": snippet.get("text"),
+        "fairness_score": snippet.get("fairness_score"),
+        "cluster": snippet.get("cluster_id", snippet.get("cluster")),
+        "metadata": {
+            "author": snippet.get("author"),
+            "date": snippet.get("publication_date"),
+            "url": snippet.get("url"),
+        }
+    }
 
 @app.get("/get-info")
 async def get_info(id: str):
@@ -116,17 +469,48 @@ async def get_info(id: str):
     if not snippet:
         raise HTTPException(status_code=404, detail="Snippet not found")
     
-    return {
-        "id": snippet["id"],
-        "source": snippet["source"],
-        "domain": snippet["domain"],
-        "language": snippet["language"],
-        "text": snippet["text"],
-        "fairness_score": snippet["fairness_score"],
-        "cluster": snippet["cluster_id"],
-        "metadata": {
-            "author": snippet["author"],
-            "date": snippet["publication_date"],
-            "url": snippet["url"],
-        }
-    }
\ No newline at end of file
+    return format_snippet(snippet)
+
+@app.post("/get-info/batch")
+async def get_info_batch(req: InfoBatchRequest):
+    found = {}
+    missing = []
+    for snippet_id in req.ids:
+        snippet = get_snippet_from_db(snippet_id)
+        if snippet:
+            found[snippet_id] = format_snippet(snippet)
+        else:
+            missing.append(snippet_id)
+    return {"results": found, "missing": missing}
+
+@app.get("/facets")
+async def facets():
+    """
+    Values available for each /query filter field.
+    """
+    return {name: metadata.facet_values(name) for name in metadata.facets}
+
+@app.get("/clusters")
+async def cluster_stats():
+    """
+    Per-cluster sizes, inertia and fairness scores precomputed by the pipeline.
+    """
+    try:
+        with open(CLUSTER_STATS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Cluster stats not available")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return query_cache.stats()
+
+@app.post("/reload")
+async def reload_corpus():
+    async with reload_lock:
+        old_metadata = metadata
+        # Reading the index and rebuilding the record store can take a while
+        await asyncio.to_thread(load_corpus)
+        # Closed on the event loop, so no request is halfway through a read
+        old_metadata.close()
+    return {"status": "ok", "entries": len(metadata)}
@@ -0,0 +1,89 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from cachetools import LRUCache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+class EncodedPayload:
+    """
+    JSON body encoded once, with an ETag and lazily built compressed variants.
+    """
+
+    def __init__(self, obj):
+        self.body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+        self._variants = {}
+
+    def encoded(self, accept_encoding):
+        """
+        Return (body, content_encoding) for the best encoding the client accepts.
+        """
+        accept_encoding = (accept_encoding or "").lower()
+        if brotli is not None and "br" in accept_encoding:
+            encoding = "br"
+        elif "gzip" in accept_encoding:
+            encoding = "gzip"
+        else:
+            return self.body, None
+        if encoding not in self._variants:
+            if encoding == "br":
+                self._variants[encoding] = brotli.compress(self.body)
+            else:
+                self._variants[encoding] = gzip.compress(self.body, compresslevel=6)
+        return self._variants[encoding], encoding
+
+
+class SphereStore:
+    """
+    Serves the sphere dataset from pre-encoded bytes, reloading only when
+    the file on disk changes. Projected / paginated views are encoded
+    once and kept in a small LRU.
+    """
+
+    def __init__(self, path, max_views=64):
+        self.path = path
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.records = []
+        self.full = None
+        self.views = LRUCache(maxsize=max_views)
+
+    def _refresh(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self.mtime:
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            # Tombstones from incremental ingestion only hold a row position
+            records = [r for r in json.load(f) if not r.get("deleted")]
+        self.records = records
+        self.full = EncodedPayload(records)
+        self.views.clear()
+        self.mtime = mtime
+        print(f"[INFO] Encoded {len(records)} sphere records ({len(self.full.body)} bytes).")
+
+    def get(self, fields=None, offset=0, limit=None):
+        with self.lock:
+            self._refresh()
+            if not fields and offset == 0 and limit is None:
+                return self.full
+            key = (tuple(fields) if fields else None, offset, limit)
+            view = self.views.get(key)
+            if view is None:
+                end = None if limit is None else offset + limit
+                records = self.records[offset:end]
+                if fields:
+                    records = [{f: r[f] for f in fields if f in r} for r in records]
+                view = EncodedPayload({
+                    "total": len(self.records),
+                    "offset": offset,
+                    "items": records
+                })
+                self.views[key] = view
+            return view
@@ -0,0 +1,184 @@
+import json
+import mmap
+import os
+from functools import lru_cache
+import numpy as np
+
+# Numeric fields kept as contiguous arrays so ranking code never has to
+# decode records: name -> (dtype, default for records without the field)
+NUMERIC_COLUMNS = {
+    "fairness_score": (np.float32, 1.0),
+    "cluster": (np.int32, -1),
+}
+
+# Filterable fields; values are compared as strings, missing ones as "unknown"
+FACET_FIELDS = ("language", "domain", "source", "cluster", "group")
+
+
+class RecordStore:
+    """
+    Read-only, memory-mapped metadata store built from a JSON list of records.
+
+    Files next to the source JSON:
+      <json>.records.bin    compact JSON, one record after another
+      <json>.offsets.npy    uint64 [N + 1] byte offsets into records.bin
+      <json>.ids.npy        ids of live (not deleted) records, sorted, for binary-search lookup
+      <json>.id_order.npy   int64 position of each sorted id
+      <json>.col.<name>.npy numeric columns (fairness_score, cluster) aligned to record positions
+      <json>.facet.<name>.npz inverted index value -> record positions for filterable fields
+                            (deleted records are left out)
+
+    Records are decoded on access, so every worker shares the same pages
+    through the OS page cache instead of holding its own parsed copy.
+    """
+
+    def __init__(self, json_file, cache_size=4096):
+        self.json_file = json_file
+        ensure_record_store(json_file)
+        with open(json_file + ".records.bin", "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.offsets = np.load(json_file + ".offsets.npy", mmap_mode="r")
+        self.ids = np.load(json_file + ".ids.npy", mmap_mode="r")
+        self.id_order = np.load(json_file + ".id_order.npy", mmap_mode="r")
+        self.columns = {
+            name: np.load(f"{json_file}.col.{name}.npy", mmap_mode="r") for name in NUMERIC_COLUMNS
+        }
+        self.facets = {}
+        for name in FACET_FIELDS:
+            with np.load(f"{json_file}.facet.{name}.npz") as facet:
+                values = facet["values"].tolist()
+                self.facets[name] = ({v: i for i, v in enumerate(values)}, facet["offsets"], facet["rows"])
+        self._decode = lru_cache(maxsize=cache_size)(self._decode_uncached)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._decode(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def column(self, name):
+        """
+        Memory-mapped array of a numeric field, indexed by record position.
+        """
+        return self.columns[name]
+
+    def facet_values(self, name):
+        return list(self.facets[name][0])
+
+    def facet_rows(self, name, value):
+        """
+        Sorted record positions whose `name` field equals `value`.
+        """
+        lookup, offsets, rows = self.facets[name]
+        v = lookup.get(str(value))
+        if v is None:
+            return rows[:0]
+        return rows[offsets[v]:offsets[v + 1]]
+
+    def filter_mask(self, filters):
+        """
+        Boolean mask over record positions for {field: [values]} filters:
+        values of one field are OR-ed, fields are AND-ed. None if no filter is set.
+        """
+        mask = None
+        for name, values in filters.items():
+            if not values:
+                continue
+            if name not in self.facets:
+                raise KeyError(f"Unknown filter field {name!r}")
+            field_mask = np.zeros(len(self), dtype=bool)
+            for value in values:
+                field_mask[self.facet_rows(name, value)] = True
+            mask = field_mask if mask is None else mask & field_mask
+        return mask
+
+    def _decode_uncached(self, i):
+        return json.loads(self.buf[self.offsets[i]:self.offsets[i + 1]])
+
+    def position_of(self, snippet_id):
+        if not len(self.ids):
+            return None
+        key = snippet_id.encode("utf-8")
+        pos = int(np.searchsorted(self.ids, key))
+        if pos < len(self.ids) and self.ids[pos] == key:
+            return int(self.id_order[pos])
+        return None
+
+    def get_by_id(self, snippet_id):
+        i = self.position_of(snippet_id)
+        return None if i is None else self[i]
+
+    def close(self):
+        """
+        Unmap records.bin. Column / id arrays are numpy memmaps and are
+        released once no caller holds them.
+        """
+        self._decode.cache_clear()
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+
+
+def ensure_record_store(json_file):
+    """
+    (Re)build the store files if they are missing or older than the JSON.
+    Files are written under temporary names and renamed into place, so
+    workers starting at the same time never see a half-written store.
+    """
+    bin_file = json_file + ".records.bin"
+    column_files = [f"{json_file}.col.{name}.npy" for name in NUMERIC_COLUMNS] + \
+        [f"{json_file}.facet.{name}.npz" for name in FACET_FIELDS]
+    if os.path.exists(bin_file) and os.path.getmtime(bin_file) >= os.path.getmtime(json_file) \
+            and all(os.path.exists(f) for f in column_files):
+        return
+
+    print(f"[INFO] Building record store for {json_file}...")
+    with open(json_file, "r", encoding="utf-8") as f:
+        records = json.load(f)
+
+    suffix = f".tmp{os.getpid()}"
+    offsets = np.zeros(len(records) + 1, dtype=np.uint64)
+    with open(bin_file + suffix, "wb") as out:
+        for i, record in enumerate(records):
+            out.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            offsets[i + 1] = out.tell()
+
+    # Only live records are looked up by id: a document deleted and later
+    # re-ingested keeps its id, and its tombstone must not shadow it
+    live = np.array([i for i, r in enumerate(records) if not r.get("deleted")], dtype=np.int64)
+    ids = np.array([str(records[i].get("id", "")).encode("utf-8") for i in live.tolist()], dtype=bytes)
+    order = np.argsort(ids, kind="stable")
+    id_order = live[order]
+
+    arrays = [("offsets", offsets), ("ids", ids[order]), ("id_order", id_order)]
+    for name, (dtype, default) in NUMERIC_COLUMNS.items():
+        values = [r.get(name) for r in records]
+        arrays.append((f"col.{name}", np.array([default if v is None else v for v in values], dtype=dtype)))
+
+    for name, array in arrays:
+        with open(f"{json_file}.{name}.npy{suffix}", "wb") as f:
+            np.save(f, array)
+        os.replace(f"{json_file}.{name}.npy{suffix}", f"{json_file}.{name}.npy")
+
+    # Deleted records (tombstones) keep their position but match no filter
+    for name in FACET_FIELDS:
+        values = np.array([str(records[i][name]) if records[i].get(name) is not None else "unknown"
+                           for i in live.tolist()], dtype=str)
+        unique, inverse = np.unique(values, return_inverse=True)
+        rows = live[np.argsort(inverse, kind="stable")]
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(inverse, minlength=len(unique)))]).astype(np.int64)
+        with open(f"{json_file}.facet.{name}.npz{suffix}", "wb") as f:
+            np.savez(f, values=unique, offsets=offsets, rows=rows)
+        os.replace(f"{json_file}.facet.{name}.npz{suffix}", f"{json_file}.facet.{name}.npz")
+    # records.bin last: its mtime marks the store as complete
+    os.replace(bin_file + suffix, bin_file)
+    print(f"[INFO] Record store built with {len(records)} records.")
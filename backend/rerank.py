@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def fair_rerank(ids, relevance, fairness, clusters, k, fairness_weight=0.3,
+                diversity_weight=0.2, max_per_cluster=None):
+    """
+    Re-rank over-fetched candidates by a blend of similarity and fairness,
+    with an MMR-style diversity penalty and optional per-cluster quota.
+
+    `ids` are the candidates (best first, -1 slots removed) and `relevance`
+    their scores, higher is better (cosine similarity, BM25 or fused rank);
+    `fairness` and `clusters` are arrays indexed by FAISS id.
+    Returns (positions into the candidate list, blended scores), best first.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(ids) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    # Relevance min-max scaled into [0, 1], 1 = most relevant
+    r = np.asarray(relevance, dtype=np.float32)
+    spread = r.max() - r.min()
+    relevance = (r - r.min()) / spread if spread > 0 else np.ones_like(r)
+
+    fair = np.asarray(fairness[ids], dtype=np.float32)
+    top = fair.max()
+    fair = fair / top if top > 0 else fair
+    base = (1.0 - fairness_weight) * relevance + fairness_weight * fair
+
+    _, groups = np.unique(np.asarray(clusters[ids]), return_inverse=True)
+    picked_per_group = np.zeros(groups.max() + 1, dtype=np.int32)
+    available = np.ones(len(ids), dtype=bool)
+    order, scores = [], []
+    for _ in range(min(k, len(ids))):
+        adjusted = base - diversity_weight * picked_per_group[groups]
+        adjusted[~available] = -np.inf
+        if max_per_cluster is not None:
+            adjusted[picked_per_group[groups] >= max_per_cluster] = -np.inf
+        best = int(np.argmax(adjusted))
+        if not np.isfinite(adjusted[best]):
+            break
+        order.append(best)
+        scores.append(float(adjusted[best]))
+        available[best] = False
+        picked_per_group[groups[best]] += 1
+    return np.array(order, dtype=np.int64), np.array(scores, dtype=np.float32)
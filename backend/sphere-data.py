@@ -1,58 +1,137 @@
+# sphere-data.py
+#
+# 3D sphere layout of the index. The UMAP reducer is fitted once and saved
+# with the layout; later runs only `transform` vectors that are new to the
+# index (and drop removed ones), so refreshing after an incremental ingest
+# takes seconds.
+#
+#   python sphere-data.py          # update the layout (fits on first run)
+#   python sphere-data.py --refit  # fit the reducer from scratch
+#
+# Outputs:
+#   sphere_coords.bin   "EQSP" | uint32 version, n | float32 lo[3], hi[3] |
+#                       int64 ids[n] | uint16 coords[n, 3]  (little-endian,
+#                       coords quantized over [lo, hi]); served as /sphere-coords
+#   sphere_data.json    compact per-point JSON for existing consumers
+
+import argparse
 import json
+import os
+import sys
+import joblib
 import numpy as np
 import umap
 import faiss
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+from index_builder import extract_vectors
+
 # CONFIG
 FAISS_INDEX_FILE = "faiss_index/equinet_faiss.index"
 METADATA_FILE = "faiss_index/equinet_metadata.json"
+LAYOUT_FILE = "faiss_index/sphere_layout.joblib"  # fitted reducer + float32 layout
+COORDS_FILE = "sphere_coords.bin"
 OUTPUT_FILE = "sphere_data.json"
+WRITE_JSON = True
+FIT_SAMPLE = 50000  # vectors the reducer is fitted on; the rest are transformed
+COORDS_VERSION = 1
+
+
+# LAYOUT
+def fingerprint(vectors):
+    # Cheap per-vector signature, so documents re-embedded in place get re-placed
+    return np.asarray(vectors[:, :8], dtype=np.float32).copy()
+
+
+def fit_layout(vectors):
+    reducer = umap.UMAP(n_components=3, random_state=42)
+    if len(vectors) <= FIT_SAMPLE:
+        return reducer, reducer.fit_transform(vectors).astype(np.float32)
+    rng = np.random.default_rng(42)
+    sample = np.sort(rng.choice(len(vectors), FIT_SAMPLE, replace=False))
+    reducer.fit(vectors[sample])
+    return reducer, reducer.transform(vectors).astype(np.float32)
+
+
+def update_layout(layout, ids, vectors):
+    """
+    Keep coordinates of unchanged ids still in the index and transform
+    only new or re-embedded ones.
+    """
+    known = dict(zip(layout["ids"].tolist(), range(len(layout["ids"]))))
+    coords = np.zeros((len(ids), 3), dtype=np.float32)
+    positions = np.array([known.get(i, -1) for i in ids.tolist()], dtype=np.int64)
+    old = positions >= 0
+    old[old] = np.all(layout["fingerprint"][positions[old]] == fingerprint(vectors[old]), axis=1)
+    coords[old] = layout["coords"][positions[old]]
+    if (~old).any():
+        print(f"[INFO] Placing {int((~old).sum())} new or changed points with the fitted reducer...")
+        coords[~old] = layout["reducer"].transform(vectors[~old])
+    removed = len(known) - int((positions >= 0).sum())
+    if removed:
+        print(f"[INFO] Dropped {removed} points no longer in the index.")
+    return coords
+
+
+# OUTPUT
+def write_coords(path, ids, coords):
+    lo, hi = coords.min(axis=0), coords.max(axis=0)
+    scale = np.where(hi > lo, hi - lo, 1.0)
+    quantized = np.round((coords - lo) / scale * 65535).astype("<u2")
+    with open(path + ".tmp", "wb") as f:
+        f.write(b"EQSP")
+        f.write(np.array([COORDS_VERSION, len(ids)], dtype="<u4").tobytes())
+        f.write(np.concatenate([lo, hi]).astype("<f4").tobytes())
+        f.write(ids.astype("<i8").tobytes())
+        f.write(quantized.tobytes())
+    os.replace(path + ".tmp", path)
+
+
+def write_json(path, ids, coords, metadata_list):
+    sphere_data = []
+    for idx, xyz in zip(ids.tolist(), np.round(coords, 4).tolist()):
+        meta = metadata_list[idx]
+        sphere_data.append({
+            "id": f"point_{idx}",
+            "coords": xyz,
+            "cluster": meta.get("cluster", 0),
+            "fairness_score": meta.get("fairness_score", 0.5),
+            "source": meta.get("source", "Unknown"),
+            "domain": meta.get("domain", "Unknown"),
+            "language": meta.get("language", "en"),
+            "text": meta.get("text", "")[:500],
+            "metadata": {
+                "timestamp": meta.get("timestamp", ""),
+                **meta.get("extra", {})
+            }
+        })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(sphere_data, f, ensure_ascii=False, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EquiNet sphere layout")
+    parser.add_argument("--refit", action="store_true", help="fit the reducer from scratch")
+    args = parser.parse_args()
+
+    index = faiss.read_index(FAISS_INDEX_FILE)
+    print(f"FAISS index loaded: {index.ntotal} vectors, dimension={index.d}")
+    ids, vectors = extract_vectors(index, FAISS_INDEX_FILE)
+
+    if args.refit or not os.path.exists(LAYOUT_FILE):
+        print("[INFO] Fitting UMAP reducer...")
+        reducer, coords = fit_layout(vectors)
+    else:
+        layout = joblib.load(LAYOUT_FILE)
+        reducer = layout["reducer"]
+        coords = update_layout(layout, ids, vectors)
+    joblib.dump({"reducer": reducer, "ids": ids, "coords": coords, "fingerprint": fingerprint(vectors)},
+                LAYOUT_FILE)
 
-# LOAD METADATA
-with open(METADATA_FILE, "r") as f:
-    metadata_list = json.load(f)
-
-# LOAD FAISS INDEX
-index = faiss.read_index(FAISS_INDEX_FILE)
-
-num_vectors = index.ntotal
-dim = index.d
-
-print(f"FAISS index loaded: {num_vectors} vectors, dimension={dim}")
-
-# EXTRACT EMBEDDINGS
-embeddings = np.zeros((num_vectors, dim), dtype=np.float32)
-for i in range(num_vectors):
-    embeddings[i] = index.reconstruct(i)
-
-print("✅ Reconstructed embeddings from FAISS index.")
-
-# DIMENSIONALITY REDUCTION (to 3D for sphere)
-reducer = umap.UMAP(n_components=3, random_state=42)
-coords = reducer.fit_transform(embeddings)
-
-print("✅ Reduced embeddings to 3D coordinates.")
-
-# CREATE JSON DATA
-sphere_data = []
-for idx, meta in enumerate(metadata_list):
-    sphere_data.append({
-        "id": f"point_{idx}",
-        "coords": coords[idx].tolist(),
-        "cluster": meta.get("cluster", 0),
-        "fairness_score": meta.get("fairness_score", 0.5),
-        "source": meta.get("source", "Unknown"),
-        "domain": meta.get("domain", "Unknown"),
-        "language": meta.get("language", "en"),
-        "text": meta.get("text", "")[:500],
-        "metadata": {
-            "timestamp": meta.get("timestamp", ""),
-            **meta.get("extra", {})
-        }
-    })
-
-# SAVE TO JSON
-with open(OUTPUT_FILE, "w") as f:
-    json.dump(sphere_data, f, indent=2)
-
-print(f"✅ Generated {OUTPUT_FILE} with {len(sphere_data)} points.")
+    write_coords(COORDS_FILE, ids, coords)
+    print(f"✅ Wrote {COORDS_FILE} with {len(ids)} points ({os.path.getsize(COORDS_FILE)} bytes).")
+    if WRITE_JSON:
+        with open(METADATA_FILE, "r", encoding="utf-8") as f:
+            metadata_list = json.load(f)
+        write_json(OUTPUT_FILE, ids, coords, metadata_list)
+        print(f"✅ Generated {OUTPUT_FILE} with {len(ids)} points.")
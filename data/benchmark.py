@@ -0,0 +1,253 @@
+# benchmark.py
+#
+# Recall / latency benchmark for the retrieval path.
+#
+#   python benchmark.py                        # index configs x batch sizes
+#   python benchmark.py --queries queries.txt  # real queries (encoded with the model)
+#   python benchmark.py --query-py             # also time query.py's query_equiNet
+#   python benchmark.py --url http://localhost:8000/query  # also time backend /query
+#
+# Compressed index types (fp16 / sq8 / pq / ivfpq) are measured both raw and
+# with exact re-ranking of over-fetched candidates, next to their memory
+# footprint relative to the flat index.
+#
+# Results are written as JSON to benchmarks/ so runs can be compared over time.
+
+import argparse
+import json
+import os
+import platform
+import time
+from datetime import datetime, timezone
+import faiss
+import numpy as np
+from index_builder import build_index, extract_vectors, normalize_rows, params_path, METRICS, COMPRESSED_TYPES, index_bytes, exact_rerank
+
+# ---------------------------
+# CONFIG
+# ---------------------------
+FAISS_INDEX_FILE = "equinet_faiss.index"
+MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+OUTPUT_DIR = "benchmarks"
+K = 10
+NUM_SYNTHETIC_QUERIES = 200
+NOISE_SCALE = 0.05  # std of the noise added to corpus vectors for synthetic queries
+BATCH_SIZES = [1, 8, 32]
+INDEX_CONFIGS = [
+    {"index_type": "flat"},
+    {"index_type": "ivf", "nprobe": 1},
+    {"index_type": "ivf", "nprobe": 8},
+    {"index_type": "ivfpq", "nprobe": 8},
+    {"index_type": "hnsw", "ef_search": 16},
+    {"index_type": "hnsw", "ef_search": 64},
+    {"index_type": "fp16"},
+    {"index_type": "sq8"},
+    {"index_type": "pq"},
+]
+RERANK_OVERFETCH = 4  # candidates re-scored exactly per result for compressed types
+
+
+# ---------------------------
+# HELPERS
+# ---------------------------
+def load_corpus_vectors(index_file):
+    """
+    Returns (vectors, metric) of the stored index. Vectors come from the
+    full-precision copy next to compressed indexes and skip removed ids.
+    """
+    index = faiss.read_index(index_file)
+    _, vectors = extract_vectors(index, index_file)
+    metric = "l2"
+    if os.path.exists(params_path(index_file)):
+        with open(params_path(index_file), "r", encoding="utf-8") as f:
+            metric = json.load(f).get("metric", "l2")
+    return vectors, metric
+
+
+def load_queries(corpus, query_file, num_queries, seed=42):
+    """
+    Return (query_texts, query_vectors). Without a query file, queries are
+    corpus vectors with a little Gaussian noise, so no model is needed.
+    """
+    if query_file:
+        from sentence_transformers import SentenceTransformer
+        with open(query_file, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        model = SentenceTransformer(MODEL_NAME)
+        vectors = model.encode(texts, show_progress_bar=False)
+        return texts, np.asarray(vectors, dtype="float32")
+
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(corpus), size=num_queries, replace=num_queries > len(corpus))
+    noise = rng.normal(0, NOISE_SCALE * corpus.std(), size=(num_queries, corpus.shape[1]))
+    return None, (corpus[picks] + noise).astype("float32")
+
+
+def ground_truth(corpus, queries, k, metric):
+    exact = faiss.IndexFlat(corpus.shape[1], METRICS[metric])
+    exact.add(corpus)
+    _, I = exact.search(queries, k)
+    return I
+
+
+def recall_at_k(found, truth, k):
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def latency_stats(latencies_ms, num_queries, wall_s):
+    lat = np.asarray(latencies_ms)
+    return {
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+        "p99_ms": float(np.percentile(lat, 99)),
+        "mean_ms": float(lat.mean()),
+        "qps": num_queries / wall_s if wall_s > 0 else None
+    }
+
+
+def time_batches(search_fn, queries, batch_size):
+    """
+    Run `search_fn` over `queries` in batches. Every query in a batch is
+    charged the batch's latency, which is what a caller would observe.
+    """
+    found, latencies = [], []
+    start = time.perf_counter()
+    for b in range(0, len(queries), batch_size):
+        batch = queries[b:b + batch_size]
+        t0 = time.perf_counter()
+        _, I = search_fn(batch)
+        elapsed = (time.perf_counter() - t0) * 1000
+        found.extend(I)
+        latencies.extend([elapsed] * len(batch))
+    return np.asarray(found), latencies, time.perf_counter() - start
+
+
+# ---------------------------
+# BENCHMARKS
+# ---------------------------
+def bench_index_configs(corpus, queries, truth, k, metric):
+    runs = []
+    flat_bytes = corpus.shape[0] * corpus.shape[1] * 4
+    for config in INDEX_CONFIGS:
+        config = dict(config)
+        index_type = config.pop("index_type")
+        t0 = time.perf_counter()
+        try:
+            index, params = build_index(corpus, index_type, metric=metric, **config)
+        except Exception as e:
+            print(f"[WARNING] Skipping {index_type} {config}: {e}")
+            continue
+        build_s = time.perf_counter() - t0
+        size = index_bytes(index)
+
+        searches = {"index": lambda q: index.search(q, k)}
+        if index_type in COMPRESSED_TYPES:
+            searches["index+rerank"] = lambda q: exact_rerank(
+                q, index.search(q, k * RERANK_OVERFETCH)[1], corpus, k, metric)
+        for name, search_fn in searches.items():
+            for batch_size in BATCH_SIZES:
+                found, latencies, wall = time_batches(search_fn, queries, batch_size)
+                run = {
+                    "name": name,
+                    "params": params,
+                    "batch_size": batch_size,
+                    "build_s": build_s,
+                    "index_bytes": size,
+                    "bytes_per_vector": size / len(corpus),
+                    "memory_saved": 1.0 - size / flat_bytes,
+                    f"recall@{k}": recall_at_k(found, truth, k),
+                    **latency_stats(latencies, len(queries), wall)
+                }
+                print(f"[INFO] {index_type:6s} {name:12s} {config} batch={batch_size:3d} "
+                      f"recall@{k}={run[f'recall@{k}']:.3f} mem={size / 2**20:.1f}MiB "
+                      f"(saved {run['memory_saved']:.0%}) p50={run['p50_ms']:.3f}ms qps={run['qps']:.0f}")
+                runs.append(run)
+    return runs
+
+
+def bench_query_py(texts, k):
+    """
+    End-to-end query.py path (encode + search + result assembly).
+    """
+    import query
+    latencies = []
+    start = time.perf_counter()
+    for text in texts:
+        t0 = time.perf_counter()
+        query.query_equiNet(text, k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    run = {"name": "query.py", "batch_size": 1,
+           **latency_stats(latencies, len(texts), time.perf_counter() - start)}
+    print(f"[INFO] query.py p50={run['p50_ms']:.1f}ms qps={run['qps']:.1f}")
+    return run
+
+
+def bench_backend(texts, url):
+    """
+    Sequential POSTs against a running backend /query endpoint.
+    """
+    import requests
+    session = requests.Session()
+    latencies = []
+    start = time.perf_counter()
+    for text in texts:
+        t0 = time.perf_counter()
+        session.post(url, json={"query": text}).raise_for_status()
+        latencies.append((time.perf_counter() - t0) * 1000)
+    run = {"name": "backend", "url": url, "batch_size": 1,
+           **latency_stats(latencies, len(texts), time.perf_counter() - start)}
+    print(f"[INFO] backend p50={run['p50_ms']:.1f}ms qps={run['qps']:.1f}")
+    return run
+
+
+# ---------------------------
+# MAIN
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EquiNet retrieval benchmark")
+    parser.add_argument("--index", default=FAISS_INDEX_FILE)
+    parser.add_argument("--queries", help="text file with one query per line")
+    parser.add_argument("--num-queries", type=int, default=NUM_SYNTHETIC_QUERIES)
+    parser.add_argument("-k", type=int, default=K)
+    parser.add_argument("--query-py", action="store_true", help="also time query.py's query_equiNet")
+    parser.add_argument("--url", help="also time a running backend, e.g. http://localhost:8000/query")
+    parser.add_argument("--output", help="result file (default: benchmarks/<timestamp>.json)")
+    args = parser.parse_args()
+
+    print(f"[INFO] Loading corpus vectors from {args.index}...")
+    corpus, metric = load_corpus_vectors(args.index)
+    texts, queries = load_queries(corpus, args.queries, args.num_queries)
+    if metric == "ip":
+        queries = normalize_rows(queries)
+    print(f"[INFO] {len(corpus)} corpus vectors, {len(queries)} queries, k={args.k}")
+
+    truth = ground_truth(corpus, queries, args.k, metric)
+    runs = bench_index_configs(corpus, queries, truth, args.k, metric)
+
+    if texts and args.query_py:
+        runs.append(bench_query_py(texts, args.k))
+    if texts and args.url:
+        runs.append(bench_backend(texts, args.url))
+    if not texts and (args.query_py or args.url):
+        print("[WARNING] --query-py / --url need real query text, pass --queries")
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "host": platform.node(),
+        "faiss_version": faiss.__version__,
+        "index_file": args.index,
+        "metric": metric,
+        "num_corpus": int(len(corpus)),
+        "num_queries": int(len(queries)),
+        "query_source": args.queries or "synthetic",
+        "k": args.k,
+        "runs": runs
+    }
+    output = args.output
+    if not output:
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        output = os.path.join(OUTPUT_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] ✅ Benchmark results saved to {output}")
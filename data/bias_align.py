@@ -1,61 +1,163 @@
 # bias_align.py
-import json
+#
+# Group-wise mean alignment of the embedded corpus: every group's centroid is
+# shifted onto the reference group's centroid. Works on the stored float32
+# matrix (no re-encoding) and saves the learned per-group offsets so ingest.py
+# can align newly embedded documents the same way. Aligned rows are
+# re-normalized, so the output stays usable with inner-product indexes:
+#   bias_offsets.npz    groups [G], offsets float32 [G, dim], reference group
+
 import numpy as np
-from sentence_transformers import SentenceTransformer
-
-print("🔧 Loading model...")
-model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
-
-print("📂 Loading dataset...")
-with open("embedded_dataset.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-print(f"Loaded {len(data)} entries")
-
-# --- STEP 1: Generate embeddings ---
-texts = [d["text"] for d in data]
-embeddings = model.encode(texts, show_progress_bar=True)
-
-# --- STEP 2: Tag groups (basic heuristic) ---
-for i, entry in enumerate(data):
-    entry["embedding"] = embeddings[i].tolist()
-    src = entry["source"].lower()
-    if any(x in src for x in ["indigenous", "globalvoices", "community", "grassroots", "local"]):
-        entry["group"] = "underrepresented"
-    else:
-        entry["group"] = "mainstream"
-
-# --- STEP 3: Normalize embeddings ---
-for d in data:
-    emb = np.array(d["embedding"])
-    d["embedding"] = (emb / np.linalg.norm(emb)).tolist()
-
-# --- STEP 4: Compute centroids per group ---
-groups = {"underrepresented": [], "mainstream": []}
-for d in data:
-    groups[d["group"]].append(np.array(d["embedding"]))
-
-under_mean = np.mean(groups["underrepresented"], axis=0)
-main_mean = np.mean(groups["mainstream"], axis=0)
-
-# --- STEP 5: Align embeddings (equalize representation) ---
-for d in data:
-    emb = np.array(d["embedding"])
-    if d["group"] == "underrepresented":
-        aligned = emb - under_mean + main_mean
-    else:
-        aligned = emb
-    d["embedding"] = aligned.tolist()
-
-# --- STEP 6: Save aligned embeddings ---
-with open("embedded_dataset_aligned.json", "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-
-print("✅ Saved aligned dataset → embedded_dataset_aligned.json")
-
-# --- STEP 7: Optional validation ---
-from sklearn.metrics.pairwise import cosine_similarity
-under = np.array(groups["underrepresented"])
-main = np.array(groups["mainstream"])
-cross_sim = np.mean(cosine_similarity(under, main))
-print(f"🔍 Cross-group similarity (post-alignment): {cross_sim:.3f}")
+from corpus_store import load_corpus, save_corpus, records_path
+
+# ---------------------------
+# CONFIG
+# ---------------------------
+INPUT_BASE = "embedded_dataset"  # corpus_store base names
+OUTPUT_BASE = "embedded_dataset_aligned"
+OFFSETS_FILE = "bias_offsets.npz"
+REFERENCE_GROUP = "mainstream"  # default group, the one every other group is aligned onto
+GROUP_RULES = {  # first matching group wins; source keywords, lowercase
+    "underrepresented": ["indigenous", "globalvoices", "community", "grassroots", "local"],
+}
+CHUNK_SIZE = 65536  # rows per step for normalisation / validation
+
+
+# ---------------------------
+# GROUPS
+# ---------------------------
+def group_names():
+    return [REFERENCE_GROUP] + [g for g in GROUP_RULES if g != REFERENCE_GROUP]
+
+
+def tag_group(entry):
+    src = entry.get("source", "").lower()
+    for group, keywords in GROUP_RULES.items():
+        if any(x in src for x in keywords):
+            return group
+    return REFERENCE_GROUP
+
+
+def group_labels(records, groups):
+    """
+    Tag every record with its group and return int labels into `groups`.
+    """
+    position = {g: i for i, g in enumerate(groups)}
+    labels = np.empty(len(records), dtype=np.int64)
+    for i, entry in enumerate(records):
+        entry["group"] = tag_group(entry)
+        labels[i] = position[entry["group"]]
+    return labels
+
+
+# ---------------------------
+# ALIGNMENT
+# ---------------------------
+def normalize(embeddings):
+    """
+    L2-normalise rows in place, chunk by chunk.
+    """
+    for start in range(0, len(embeddings), CHUNK_SIZE):
+        block = embeddings[start:start + CHUNK_SIZE]
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        block /= np.maximum(norms, 1e-12)
+    return embeddings
+
+
+def group_centroids(embeddings, labels, num_groups):
+    centroids = np.zeros((num_groups, embeddings.shape[1]), dtype=np.float32)
+    for g in range(num_groups):
+        mask = labels == g
+        if mask.any():
+            centroids[g] = embeddings[mask].mean(axis=0)
+    return centroids
+
+
+def fit_offsets(embeddings, labels, num_groups, reference=0):
+    """
+    offsets[g] = centroid[reference] - centroid[g]; empty groups get no shift.
+    """
+    centroids = group_centroids(embeddings, labels, num_groups)
+    offsets = centroids[reference] - centroids
+    counts = np.bincount(labels, minlength=num_groups)
+    offsets[counts == 0] = 0.0
+    return offsets.astype(np.float32)
+
+
+def align(embeddings, labels, offsets):
+    """
+    Shift every row by its group's offset, in place.
+    """
+    for start in range(0, len(embeddings), CHUNK_SIZE):
+        embeddings[start:start + CHUNK_SIZE] += offsets[labels[start:start + CHUNK_SIZE]]
+    return embeddings
+
+
+def save_offsets(groups, offsets, path=OFFSETS_FILE):
+    np.savez(path, groups=np.array(groups), offsets=offsets, reference=np.array(REFERENCE_GROUP))
+
+
+def load_offsets(path=OFFSETS_FILE):
+    """
+    Returns {group: offset vector}.
+    """
+    with np.load(path) as f:
+        return dict(zip(f["groups"].tolist(), f["offsets"]))
+
+
+# ---------------------------
+# VALIDATION
+# ---------------------------
+def mean_cross_similarity(embeddings, labels, num_groups):
+    """
+    Mean pairwise cosine similarity between groups, [G, G]. The mean of
+    a_i . b_j over unit rows equals mean(a) . mean(b), so one streaming
+    pass of per-group sums over normalised rows gives the exact value.
+    """
+    sums = np.zeros((num_groups, embeddings.shape[1]), dtype=np.float64)
+    for start in range(0, len(embeddings), CHUNK_SIZE):
+        block = np.asarray(embeddings[start:start + CHUNK_SIZE], dtype=np.float32)
+        block = block / np.maximum(np.linalg.norm(block, axis=1, keepdims=True), 1e-12)
+        block_labels = labels[start:start + CHUNK_SIZE]
+        for g in range(num_groups):
+            mask = block_labels == g
+            if mask.any():
+                sums[g] += block[mask].sum(axis=0)
+    counts = np.bincount(labels, minlength=num_groups)
+    means = sums / np.maximum(counts, 1)[:, None]
+    return means @ means.T
+
+
+def report(similarity, groups, label):
+    print(f"🔍 Cross-group similarity ({label}):")
+    for a in range(1, len(groups)):
+        print(f"   {groups[a]} ↔ {groups[0]}: {similarity[a, 0]:.3f}")
+
+
+# ---------------------------
+# MAIN
+# ---------------------------
+if __name__ == "__main__":
+    print("📂 Loading dataset...")
+    data, embeddings = load_corpus(INPUT_BASE, mmap=False)
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    print(f"Loaded {len(data)} entries")
+
+    groups = group_names()
+    labels = group_labels(data, groups)
+    print("   " + ", ".join(f"{g}: {n}" for g, n in zip(groups, np.bincount(labels, minlength=len(groups)))))
+
+    normalize(embeddings)
+    report(mean_cross_similarity(embeddings, labels, len(groups)), groups, "pre-alignment")
+
+    offsets = fit_offsets(embeddings, labels, len(groups))
+    align(embeddings, labels, offsets)
+    normalize(embeddings)
+    save_offsets(groups, offsets)
+    print(f"✅ Saved group offsets → {OFFSETS_FILE}")
+
+    save_corpus(OUTPUT_BASE, data, embeddings)
+    print(f"✅ Saved aligned dataset → {records_path(OUTPUT_BASE)}")
+    print(f"   (export for the frontend: python corpus_store.py to-json {OUTPUT_BASE} {OUTPUT_BASE}.json)")
+
+    report(mean_cross_similarity(embeddings, labels, len(groups)), groups, "post-alignment")
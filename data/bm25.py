@@ -0,0 +1,99 @@
+# bm25.py
+#
+# In-process BM25 inverted index over the raw `text` (processed_text is
+# ASCII-only, which would drop non-Latin names), aligned with the
+# FAISS ids (row i of the index <-> document i). Postings are stored in CSR
+# form with their BM25 weight precomputed, so a query is a handful of
+# vectorized adds:
+#   <file>.npz   terms (sorted), offsets [V + 1], docs int32, weights float32, num_docs
+
+import re
+import unicodedata
+from collections import Counter
+import numpy as np
+
+TOKEN_RE = re.compile(r"(?:\w|[\u0300-\u036f])+")  # keep combining marks inside words
+K1 = 1.5
+B = 0.75
+
+
+def tokenize(text):
+    """
+    Same tokens for documents and queries: NFC-normalized, lowercased
+    Unicode words.
+    """
+    return TOKEN_RE.findall(unicodedata.normalize("NFC", text).lower())
+
+
+class BM25Index:
+    def __init__(self, terms, offsets, docs, weights, num_docs):
+        self.terms = terms
+        self.vocab = {t: i for i, t in enumerate(terms.tolist())}
+        self.offsets = offsets
+        self.docs = docs
+        self.weights = weights
+        self.num_docs = int(num_docs)
+
+    @classmethod
+    def build(cls, texts, k1=K1, b=B):
+        vocab = {}
+        post_terms, post_docs, post_tfs = [], [], []
+        doc_len = np.zeros(len(texts), dtype=np.float32)
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text or ""))
+            doc_len[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                post_terms.append(vocab.setdefault(term, len(vocab)))
+                post_docs.append(doc)
+                post_tfs.append(tf)
+
+        post_terms = np.array(post_terms, dtype=np.int64)
+        post_docs = np.array(post_docs, dtype=np.int32)
+        tf = np.array(post_tfs, dtype=np.float32)
+
+        # Renumber terms alphabetically and group postings by term (CSR)
+        terms = np.array(sorted(vocab), dtype=str) if vocab else np.array([], dtype=str)
+        rank = np.empty(len(vocab), dtype=np.int64)
+        rank[[vocab[t] for t in terms.tolist()]] = np.arange(len(vocab))
+        post_terms = rank[post_terms] if len(post_terms) else post_terms
+        order = np.argsort(post_terms, kind="stable")
+        post_terms, post_docs, tf = post_terms[order], post_docs[order], tf[order]
+        df = np.bincount(post_terms, minlength=len(terms))
+        offsets = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+
+        n = len(texts)
+        avgdl = doc_len.mean() if n and doc_len.mean() > 0 else 1.0
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * doc_len[post_docs] / avgdl)
+        weights = (idf[post_terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+        return cls(terms, offsets, post_docs, weights, n)
+
+    def save(self, path):
+        np.savez(path, terms=self.terms, offsets=self.offsets, docs=self.docs,
+                 weights=self.weights, num_docs=np.int64(self.num_docs))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls(f["terms"], f["offsets"], f["docs"], f["weights"], f["num_docs"])
+
+    def search(self, query, k, mask=None):
+        """
+        Top-k (scores, doc ids) for `query`, best first. `mask` (bool per
+        doc) restricts the candidates. Docs with no matching term are left out.
+        """
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            lo, hi = self.offsets[t], self.offsets[t + 1]
+            # A term's postings hold each doc once, so fancy-index add is safe
+            scores[self.docs[lo:hi]] += self.weights[lo:hi]
+        if mask is not None:
+            scores[~mask[:self.num_docs]] = 0
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return scores[hits], hits.astype(np.int64)
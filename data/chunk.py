@@ -0,0 +1,97 @@
+# chunk.py
+#
+# Splits long documents (PDF reports, podcast transcripts, ...) into
+# overlapping, token-bounded passages so each vector covers a piece of
+# text the embedding model actually sees (MiniLM truncates at 128 tokens).
+#
+#   processed_dataset.json  ->  passages_dataset.jsonl  ->  embed.py
+
+import hashlib
+import json
+from transformers import AutoTokenizer
+from corpus_store import document_key
+
+# ---------------------------
+# CONFIG
+# ---------------------------
+MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+INPUT_FILE = "processed_dataset.json"
+OUTPUT_FILE = "passages_dataset.jsonl"
+MAX_TOKENS = 128  # model max_seq_length, including special tokens
+OVERLAP_TOKENS = 32
+MIN_PASSAGE_TOKENS = 16  # a shorter tail is merged into the previous passage
+
+tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+
+
+def parent_id(entry):
+    return "doc_" + hashlib.sha1(document_key(entry).encode("utf-8")).hexdigest()[:12]
+
+
+def token_spans(text):
+    """
+    Character (start, end) span of every token in `text`.
+    """
+    encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+    return [(s, e) for s, e in encoding["offset_mapping"] if e > s]
+
+
+def chunk_spans(spans, max_tokens=MAX_TOKENS - 2, overlap=OVERLAP_TOKENS):
+    """
+    (char_start, char_end) windows of at most `max_tokens` tokens, each
+    overlapping the previous one by `overlap` tokens.
+    """
+    if not spans:
+        return []
+    step = max(1, max_tokens - overlap)
+    windows = []
+    for start in range(0, len(spans), step):
+        end = min(start + max_tokens, len(spans))
+        if windows and end - start < MIN_PASSAGE_TOKENS:
+            windows[-1] = (windows[-1][0], spans[end - 1][1])
+            break
+        windows.append((spans[start][0], spans[end - 1][1]))
+        if end == len(spans):
+            break
+    return windows
+
+
+def chunk_document(entry):
+    text = entry.get("text", "")
+    doc_id = parent_id(entry)
+    windows = chunk_spans(token_spans(text)) or [(0, len(text))]
+    for j, (start, end) in enumerate(windows):
+        passage = {k: v for k, v in entry.items() if k not in ("text", "id", "pages", "segments")}
+        passage.update({
+            "id": f"{doc_id}_p{j:03d}",
+            "parent_id": doc_id,
+            "chunk_index": j,
+            "num_chunks": len(windows),
+            "char_start": start,
+            "char_end": end,
+            "text": text[start:end]
+        })
+        if entry.get("pages"):
+            # Page numbers the passage spans (PDF reports)
+            passage["pages"] = [p["page"] for p in entry["pages"]
+                                if p["char_start"] < end and p["char_end"] > start]
+        segments = [s for s in entry.get("segments", []) if s["char_start"] < end and s["char_end"] > start]
+        if segments:
+            # Time range the passage covers, in seconds (podcast transcripts)
+            passage["start_time"] = min(s["start"] for s in segments)
+            passage["end_time"] = max(s["end"] for s in segments)
+        yield passage
+
+
+if __name__ == "__main__":
+    with open(INPUT_FILE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    num_passages = 0
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as out:
+        for entry in data:
+            for passage in chunk_document(entry):
+                out.write(json.dumps(passage, ensure_ascii=False) + "\n")
+                num_passages += 1
+
+    print(f"[INFO] Chunked {len(data)} documents into {num_passages} passages → {OUTPUT_FILE}")
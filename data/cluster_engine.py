@@ -0,0 +1,82 @@
+# cluster_engine.py
+#
+# Clustering backends that scale past what full-batch KMeans can hold:
+#   "kmeans"     scikit-learn KMeans on the full matrix (small corpora)
+#   "minibatch"  scikit-learn MiniBatchKMeans fed chunk by chunk (bounded memory)
+#   "faiss"      faiss.Kmeans, subsamples max_points_per_centroid points per centroid
+# plus a sampled silhouette sweep to pick K and chunked nearest-centroid assignment.
+
+import faiss
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+
+BACKENDS = ("kmeans", "minibatch", "faiss")
+CHUNK_SIZE = 65536  # rows handled per step for streaming fits and assignment
+
+
+def sample_rows(embeddings, size, seed=42):
+    if len(embeddings) <= size:
+        return np.asarray(embeddings, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(embeddings), size=size, replace=False))
+    return np.asarray(embeddings[rows], dtype=np.float32)
+
+
+def fit_centroids(embeddings, k, backend="kmeans", seed=42, max_iter=20):
+    """
+    float32 [k, dim] centroids. `embeddings` may be a read-only memmap;
+    the minibatch backend only ever holds CHUNK_SIZE rows in memory.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown clustering backend {backend!r}, expected one of {BACKENDS}")
+    if backend == "kmeans":
+        model = KMeans(n_clusters=k, random_state=seed).fit(np.asarray(embeddings, dtype=np.float32))
+        return model.cluster_centers_.astype(np.float32)
+    if backend == "minibatch":
+        model = MiniBatchKMeans(n_clusters=k, random_state=seed, batch_size=4096, n_init=3)
+        for _ in range(max_iter):
+            for start in range(0, len(embeddings), CHUNK_SIZE):
+                chunk = np.asarray(embeddings[start:start + CHUNK_SIZE], dtype=np.float32)
+                if len(chunk) >= k:
+                    model.partial_fit(chunk)
+        return model.cluster_centers_.astype(np.float32)
+    data = np.ascontiguousarray(embeddings, dtype=np.float32)
+    kmeans = faiss.Kmeans(data.shape[1], k, niter=max_iter, seed=seed, max_points_per_centroid=256)
+    kmeans.train(data)
+    return kmeans.centroids.astype(np.float32)
+
+
+def assign(embeddings, centroids):
+    """
+    Nearest-centroid label for every row, computed in chunks. This is what
+    lets incremental ingestion label new vectors without re-clustering.
+    """
+    index = faiss.IndexFlatL2(centroids.shape[1])
+    index.add(np.ascontiguousarray(centroids, dtype=np.float32))
+    labels = np.empty(len(embeddings), dtype=np.int64)
+    for start in range(0, len(embeddings), CHUNK_SIZE):
+        chunk = np.ascontiguousarray(embeddings[start:start + CHUNK_SIZE], dtype=np.float32)
+        _, I = index.search(chunk, 1)
+        labels[start:start + len(chunk)] = I[:, 0]
+    return labels
+
+
+def select_k(embeddings, candidates, backend="kmeans", sample_size=10000, seed=42):
+    """
+    Pick K by silhouette score on a sample. Returns (best_k, {k: score}).
+    """
+    sample = sample_rows(embeddings, sample_size, seed)
+    scores = {}
+    for k in candidates:
+        if not 2 <= k < len(sample):
+            continue
+        centroids = fit_centroids(sample, k, backend, seed)
+        labels = assign(sample, centroids)
+        if len(np.unique(labels)) < 2:
+            continue
+        scores[k] = float(silhouette_score(sample, labels, sample_size=min(len(sample), 5000), random_state=seed))
+        print(f"[INFO]   K={k}: silhouette={scores[k]:.4f}")
+    if not scores:
+        raise ValueError("No valid K candidate for this corpus size")
+    return max(scores, key=scores.get), scores
@@ -0,0 +1,80 @@
+# cluster_stats.py
+#
+# Vectorized cluster representation / fairness statistics and the
+# per-cluster stats artifact shared by clustering.py, ingest.py and the backend:
+#   cluster_stats.json       sizes, representation, inertia, fairness score per cluster
+#   cluster_centroids.npy    float32 [K, dim] centroids, row k <-> cluster k
+
+import json
+import numpy as np
+
+STATS_FILE = "cluster_stats.json"
+CENTROIDS_FILE = "cluster_centroids.npy"
+CHUNK_SIZE = 65536  # rows per step when accumulating inertia
+
+
+def fairness_scores(labels, num_clusters):
+    """
+    Per-cluster fairness = max representation / cluster representation, so
+    the largest cluster scores 1 and smaller clusters score higher.
+    Empty clusters score 0.
+    """
+    counts = np.bincount(labels, minlength=num_clusters)
+    scores = np.zeros(num_clusters, dtype=np.float64)
+    nonzero = counts > 0
+    scores[nonzero] = counts.max() / counts[nonzero]
+    return counts, np.round(scores, 3)
+
+
+def compute_stats(embeddings, labels, centroids, rows=None):
+    """
+    Stats for `labels` over `embeddings` (or its `rows`, labels aligned
+    with them). `embeddings` may be a memmap; squared distances are
+    accumulated CHUNK_SIZE rows at a time so memory stays bounded.
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    centroids = np.asarray(centroids, dtype=np.float32)
+    num_clusters = len(centroids)
+    counts, scores = fairness_scores(labels, num_clusters)
+    inertia = np.zeros(num_clusters, dtype=np.float64)
+    for start in range(0, len(labels), CHUNK_SIZE):
+        block_labels = labels[start:start + CHUNK_SIZE]
+        if rows is None:
+            block = embeddings[start:start + CHUNK_SIZE]
+        else:
+            block = embeddings[rows[start:start + CHUNK_SIZE]]
+        diff = np.asarray(block, dtype=np.float32) - centroids[block_labels]
+        inertia += np.bincount(block_labels, weights=(diff * diff).sum(axis=1), minlength=num_clusters)
+    total = max(len(labels), 1)
+    return {
+        "num_clusters": num_clusters,
+        "num_points": int(len(labels)),
+        "inertia": float(inertia.sum()),
+        "clusters": [
+            {
+                "cluster": k,
+                "size": int(counts[k]),
+                "representation": float(counts[k] / total),
+                "inertia": float(inertia[k]),
+                "fairness_score": float(scores[k])
+            }
+            for k in range(num_clusters)
+        ]
+    }
+
+
+def save_stats(stats, centroids, stats_file=STATS_FILE, centroids_file=CENTROIDS_FILE):
+    with open(stats_file, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+    np.save(centroids_file, np.asarray(centroids, dtype=np.float32))
+
+
+def load_stats(stats_file=STATS_FILE, centroids_file=CENTROIDS_FILE):
+    """
+    (stats, centroids, fairness score per cluster as an array).
+    """
+    with open(stats_file, "r", encoding="utf-8") as f:
+        stats = json.load(f)
+    centroids = np.load(centroids_file)
+    scores = np.array([c["fairness_score"] for c in stats["clusters"]], dtype=np.float64)
+    return stats, centroids, scores
@@ -1,69 +1,65 @@
-import json
-import numpy as np
-from sklearn.cluster import KMeans
-from collections import Counter
-from tqdm import tqdm
+from cluster_engine import fit_centroids, assign, select_k
+from corpus_store import load_corpus, save_corpus, records_path
+from cluster_stats import compute_stats, fairness_scores, save_stats, STATS_FILE
+from bias_align import tag_group
 
 # ---------------------------
 # CONFIG
 # ---------------------------
-INPUT_FILE = "embedded_dataset.json"
-OUTPUT_FILE = "clustered_dataset.json"
-NUM_CLUSTERS = 10  # Tune this for your dataset size
+INPUT_BASE = "embedded_dataset"  # corpus_store base names
+OUTPUT_BASE = "clustered_dataset"
+NUM_CLUSTERS = 10  # fixed K, or "auto" to pick one from K_CANDIDATES
+K_CANDIDATES = [5, 8, 10, 15, 20, 30, 50]  # swept with a sampled silhouette score when NUM_CLUSTERS = "auto"
+CLUSTER_BACKEND = "kmeans"  # "kmeans", "minibatch" or "faiss" (see cluster_engine.py)
 
 # ---------------------------
 # LOAD DATA
 # ---------------------------
 print("[INFO] Loading embedded dataset...")
-with open(INPUT_FILE, "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-embeddings = np.array([entry["embedding"] for entry in data])
+data, embeddings = load_corpus(INPUT_BASE)
 print(f"[INFO] {len(embeddings)} embeddings loaded.")
 
 # ---------------------------
 # CLUSTERING
 # ---------------------------
-print(f"[INFO] Running KMeans clustering with {NUM_CLUSTERS} clusters...")
-kmeans = KMeans(n_clusters=NUM_CLUSTERS, random_state=42)
-labels = kmeans.fit_predict(embeddings)
+num_clusters = NUM_CLUSTERS
+if num_clusters == "auto":
+    print(f"[INFO] Selecting K from {K_CANDIDATES}...")
+    num_clusters, _ = select_k(embeddings, K_CANDIDATES, CLUSTER_BACKEND)
+    print(f"[INFO] Selected K={num_clusters}.")
 
-for i, entry in enumerate(data):
-    entry["cluster"] = int(labels[i])
+print(f"[INFO] Running {CLUSTER_BACKEND} clustering with {num_clusters} clusters...")
+centroids = fit_centroids(embeddings, num_clusters, CLUSTER_BACKEND)
+labels = assign(embeddings, centroids)
 
 print("[INFO] Clustering complete.")
 
 # ---------------------------
-# REPRESENTATION ANALYSIS
+# REPRESENTATION + FAIRNESS SCORING
 # ---------------------------
-print("[INFO] Calculating representation per cluster...")
-cluster_counts = Counter([entry["cluster"] for entry in data])
-total_snippets = len(data)
+print("[INFO] Calculating representation and fairness per cluster...")
+stats = compute_stats(embeddings, labels, centroids)
+stats["backend"] = CLUSTER_BACKEND
+_, scores = fairness_scores(labels, num_clusters)
 
 print("Cluster representation (% of dataset):")
-for cluster_id, count in cluster_counts.items():
-    representation = count / total_snippets
-    print(f"  Cluster {cluster_id}: {representation*100:.2f}%")
+for c in stats["clusters"]:
+    print(f"  Cluster {c['cluster']}: {c['representation']*100:.2f}%  fairness={c['fairness_score']}")
 
-# ---------------------------
-# FAIRNESS SCORING
-# ---------------------------
-print("[INFO] Assigning fairness scores...")
-max_representation = max(cluster_counts.values()) / total_snippets
-
-for cluster_id, count in cluster_counts.items():
-    representation = count / total_snippets
-    fairness_score = max_representation / representation
-    for entry in data:
-        if entry["cluster"] == cluster_id:
-            entry["fairness_score"] = round(fairness_score, 3)
+entry_scores = scores[labels]
+for entry, label, score in zip(data, labels.tolist(), entry_scores.tolist()):
+    entry["cluster"] = label
+    entry["fairness_score"] = score
+    entry.setdefault("group", tag_group(entry))  # corpora embedded before embed.py tagged groups
 
 print("[INFO] Fairness scoring complete.")
 
 # ---------------------------
 # SAVE OUTPUT
 # ---------------------------
-with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-    json.dump(data, f, indent=2, ensure_ascii=False)
+save_corpus(OUTPUT_BASE, data, embeddings)
+
+print(f"[INFO] Clustered dataset saved to {records_path(OUTPUT_BASE)}")
 
-print(f"[INFO] Clustered dataset saved to {OUTPUT_FILE}")
+save_stats(stats, centroids)
+print(f"[INFO] Cluster stats saved to {STATS_FILE}")
@@ -1,9 +1,9 @@
 import json
 import random
+from corpus_store import load_records
 
-# Load the JSON file
-with open("clustered_dataset.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
+# Load the clustered corpus (embeddings live in a separate .npy and aren't needed)
+data = load_records("clustered_dataset")
 
 # Process each item
 for item in data:
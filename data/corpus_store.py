@@ -0,0 +1,263 @@
+# corpus_store.py
+#
+# Binary corpus format shared by the pipeline stages. A corpus "<base>" is
+#   <base>.parquet          one row per snippet (text + metadata, no embeddings)
+#   <base>.embeddings.npy   float32 (or float16, see EMBEDDING_DTYPE) [N, dim] matrix,
+#                           row i <-> parquet row i
+#
+# Convert existing JSON files with:
+#   python corpus_store.py from-json embedded_dataset.json embedded_dataset
+#   python corpus_store.py to-json embedded_dataset_aligned embedded_dataset_aligned.json
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+JSON_COLUMNS_KEY = b"equinet.json_columns"
+EMBEDDING_DTYPE = "float32"  # "float16" halves the corpus on disk and in the page cache
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def document_key(entry):
+    """
+    Stable identity of a record across runs: its passage position for
+    chunked records, else its URL / file / title when known, otherwise
+    the hash of its text.
+    """
+    if entry.get("parent_id") and "chunk_index" in entry:
+        return f"passage:{entry['parent_id']}:{entry['chunk_index']}"
+    meta = entry.get("metadata") or {}
+    for key in ("url", "file_name"):
+        if entry.get(key):
+            return f"{key}:{entry[key]}"
+    if meta.get("title"):
+        return f"title:{entry.get('source')}:{meta['title']}"
+    return "text:" + content_hash(entry.get("text", ""))
+
+
+def iter_documents(path):
+    """
+    Yield input documents. JSONL is streamed line by line; a JSON list
+    has to be parsed whole.
+    """
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def count_documents(path):
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            return sum(1 for line in f if line.strip())
+    return sum(1 for _ in iter_documents(path))
+
+
+def records_path(base):
+    return base + ".parquet"
+
+
+def embeddings_path(base):
+    return base + ".embeddings.npy"
+
+
+def exists(base):
+    return os.path.exists(records_path(base))
+
+
+def _column(values):
+    """
+    Arrow array for a column, or None if the values don't share a type
+    (nested dicts/lists, mixed types) and need JSON encoding instead.
+    """
+    if any(isinstance(v, (dict, list)) for v in values):
+        return None
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+
+
+def _json_encode(values):
+    return pa.array([None if v is None else json.dumps(v, ensure_ascii=False) for v in values],
+                    type=pa.string())
+
+
+def _records_table(records):
+    columns = {}
+    for record in records:
+        for key in record:
+            columns.setdefault(key, None)
+    arrays, json_columns = {}, []
+    for key in columns:
+        values = [record.get(key) for record in records]
+        array = _column(values)
+        if array is None:
+            array = _json_encode(values)
+            json_columns.append(key)
+        arrays[key] = array
+    table = pa.table(arrays)
+    return table.replace_schema_metadata({JSON_COLUMNS_KEY: json.dumps(json_columns).encode()})
+
+
+def save_records(base, records):
+    pq.write_table(_records_table(records), records_path(base), compression="zstd")
+
+
+# ---------------------------
+# STREAMED WRITES
+# ---------------------------
+# Stages that produce records chunk by chunk write each chunk as a part file
+# and merge them at the end, so they never hold the whole corpus in memory.
+def parts_dir(base):
+    return base + ".parts"
+
+
+def part_path(base, part):
+    return os.path.join(parts_dir(base), f"{part:06d}.parquet")
+
+
+def save_records_part(base, part, records):
+    os.makedirs(parts_dir(base), exist_ok=True)
+    pq.write_table(_records_table(records), part_path(base, part), compression="zstd")
+
+
+def merge_record_parts(base, num_parts):
+    """
+    Stream parts 0..num_parts-1 into `<base>.parquet` one part at a time.
+    Columns that are JSON-encoded in any part, or whose type differs
+    between parts, are JSON-encoded throughout.
+    """
+    if num_parts == 0:
+        save_records(base, [])
+        shutil.rmtree(parts_dir(base), ignore_errors=True)
+        return
+    paths = [part_path(base, part) for part in range(num_parts)]
+    schemas = [pq.read_schema(path) for path in paths]
+    part_json = [set(json.loads((s.metadata or {}).get(JSON_COLUMNS_KEY, b"[]"))) for s in schemas]
+    types = {}
+    for schema in schemas:
+        for field in schema:
+            types.setdefault(field.name, set())
+            if field.type != pa.null():
+                types[field.name].add(field.type)
+    json_columns = [name for name in types
+                    if len(types[name]) > 1 or any(name in j for j in part_json)]
+    schema = pa.schema(
+        [(name, pa.string() if name in json_columns else (next(iter(t)) if t else pa.null()))
+         for name, t in types.items()],
+        metadata={JSON_COLUMNS_KEY: json.dumps(json_columns).encode()}
+    )
+
+    tmp = records_path(base) + ".tmp"
+    with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+        for path, encoded in zip(paths, part_json):
+            table = pq.read_table(path)
+            arrays = []
+            for field in schema:
+                if field.name not in table.column_names:
+                    arrays.append(pa.nulls(table.num_rows, field.type))
+                elif field.name in json_columns and field.name not in encoded:
+                    arrays.append(_json_encode(table.column(field.name).to_pylist()))
+                else:
+                    arrays.append(table.column(field.name).cast(field.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+    os.replace(tmp, records_path(base))
+    shutil.rmtree(parts_dir(base))
+
+
+def load_records(base, columns=None):
+    """
+    Rows as dicts. Keys whose value is null are left out, so `.get(key, default)`
+    behaves as it did on the original JSON records.
+    """
+    table = pq.read_table(records_path(base), columns=columns)
+    meta = table.schema.metadata or {}
+    json_columns = set(json.loads(meta.get(JSON_COLUMNS_KEY, b"[]")))
+    records = []
+    for row in table.to_pylist():
+        record = {}
+        for key, value in row.items():
+            if value is None:
+                continue
+            record[key] = json.loads(value) if key in json_columns else value
+        records.append(record)
+    return records
+
+
+def save_embeddings(base, embeddings, dtype=None):
+    np.save(embeddings_path(base), np.ascontiguousarray(embeddings, dtype=dtype or EMBEDDING_DTYPE))
+
+
+def load_embeddings(base, mmap=True):
+    """
+    Embedding matrix in its stored dtype (float32 or float16),
+    memory-mapped read-only by default. Consumers that need float32
+    (FAISS) convert chunk by chunk.
+    """
+    return np.load(embeddings_path(base), mmap_mode="r" if mmap else None)
+
+
+def save_corpus(base, records, embeddings=None, dtype=None):
+    records = [{k: v for k, v in r.items() if k != "embedding"} for r in records]
+    save_records(base, records)
+    if embeddings is not None:
+        if len(embeddings) != len(records):
+            raise ValueError(f"{len(embeddings)} embeddings for {len(records)} records")
+        save_embeddings(base, embeddings, dtype)
+
+
+def load_corpus(base, mmap=True):
+    """
+    (records, embeddings) for a corpus. Falls back to a legacy `<base>.json`
+    file when the binary corpus hasn't been written yet.
+    """
+    if not exists(base) and os.path.exists(base + ".json"):
+        print(f"[WARNING] {records_path(base)} not found, reading legacy {base}.json")
+        return from_json(base + ".json")
+    embeddings = load_embeddings(base, mmap) if os.path.exists(embeddings_path(base)) else None
+    return load_records(base), embeddings
+
+
+def from_json(json_file):
+    with open(json_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    embeddings = None
+    if data and all("embedding" in d for d in data):
+        embeddings = np.array([d["embedding"] for d in data], dtype=np.float32)
+    return [{k: v for k, v in d.items() if k != "embedding"} for d in data], embeddings
+
+
+def to_json(base, json_file, include_embeddings=True):
+    records, embeddings = load_corpus(base)
+    if include_embeddings and embeddings is not None:
+        for record, emb in zip(records, embeddings):
+            record["embedding"] = emb.tolist()
+    with open(json_file, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("from-json", "to-json"):
+        print("usage: python corpus_store.py from-json <input.json> <base>\n"
+              "       python corpus_store.py to-json <base> <output.json>")
+        sys.exit(1)
+    if sys.argv[1] == "from-json":
+        records, embeddings = from_json(sys.argv[2])
+        save_corpus(sys.argv[3], records, embeddings)
+        print(f"[INFO] Wrote {len(records)} records to {records_path(sys.argv[3])}")
+    else:
+        to_json(sys.argv[2], sys.argv[3])
+        print(f"[INFO] Wrote {sys.argv[3]}")
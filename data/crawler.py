@@ -0,0 +1,141 @@
+# crawler.py
+#
+# Concurrent HTTP fetcher shared by scrape.py and scrape_2.py:
+#   - one pooled requests.Session for every request
+#   - a thread pool with a per-host concurrency limit
+#   - retries with exponential backoff on connection errors / 429 / 5xx
+#   - ETag / Last-Modified conditional requests backed by a local SQLite
+#     fetch cache, so unchanged pages come back as `unchanged` without a body transfer
+#
+# Everything is plain HTTP, so it can be pointed at a local stand-in server
+# (e.g. `python -m http.server`) for testing.
+
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fetch_cache.sqlite")
+USER_AGENT = "EquiNetCrawler/1.0 (+https://github.com/YakshithK/EquiNet)"
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    body: bytes
+    unchanged: bool = False  # True when the server answered 304 and the body came from the cache
+    encoding: str = "utf-8"
+
+    @property
+    def text(self):
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+
+class FetchCache:
+    def __init__(self, path=DEFAULT_CACHE):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, encoding TEXT,"
+            " body BLOB NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, url):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT etag, last_modified, encoding, body FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+
+    def put(self, url, etag, last_modified, encoding, body):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, encoding, body, time.time())
+            )
+            self.conn.commit()
+
+
+class Crawler:
+    def __init__(self, cache_path=DEFAULT_CACHE, max_workers=16, per_host=4,
+                 retries=3, backoff=0.5, timeout=20):
+        self.cache = FetchCache(cache_path) if cache_path else None
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.host_limits = {}
+        self.host_lock = threading.Lock()
+
+        retry = Retry(total=retries, backoff_factor=backoff,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET", "HEAD"), respect_retry_after_header=True)
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        with self.host_lock:
+            if host not in self.host_limits:
+                self.host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self.host_limits[host]
+
+    def fetch(self, url):
+        """
+        GET `url`, conditionally when it is cached. Returns a FetchResult,
+        or None if the request failed after retries.
+        """
+        cached = self.cache.get(url) if self.cache else None
+        headers = {}
+        if cached:
+            etag, last_modified, _, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        try:
+            with self._host_limit(url):
+                r = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"[ERROR] Failed to fetch {url}: {e}")
+            return None
+
+        if r.status_code == 304 and cached:
+            return FetchResult(url, 304, cached[3], unchanged=True, encoding=cached[2])
+        if r.status_code >= 400:
+            print(f"[ERROR] {url} returned HTTP {r.status_code}")
+            return None
+
+        encoding = r.encoding or r.apparent_encoding or "utf-8"
+        if self.cache:
+            self.cache.put(url, r.headers.get("ETag"), r.headers.get("Last-Modified"), encoding, r.content)
+        return FetchResult(url, r.status_code, r.content, encoding=encoding)
+
+    def map(self, fn, items):
+        """
+        Run `fn(item)` for every item on the thread pool, yielding
+        (item, result) as they complete. Exceptions are logged and skipped.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(fn, item): item for item in items}
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    yield item, future.result()
+                except Exception as e:
+                    print(f"[ERROR] {item}: {e}")
+
+    def fetch_all(self, urls):
+        yield from self.map(self.fetch, urls)
@@ -1,18 +1,30 @@
 from sentence_transformers import SentenceTransformer
 import json
+import os
+import shutil
 import numpy as np
 import re
 import langdetect
 from tqdm import tqdm
+from corpus_store import save_records_part, merge_record_parts, parts_dir, part_path, records_path, embeddings_path, \
+    EMBEDDING_DTYPE, iter_documents, count_documents
+from embedding_cache import EmbeddingCache
+from bias_align import tag_group
 
 # ---------------------------
 # CONFIG
 # ---------------------------
 MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-INPUT_FILE = "processed_dataset.json"   # Dataset generated from scraping/transcription
-OUTPUT_FILE = "embedded_dataset.json"
+INPUT_FILE = "passages_dataset.jsonl"   # chunk.py output (.json or .jsonl)
+OUTPUT_BASE = "embedded_dataset"  # corpus_store base name
+PREPROCESS_VERSION = "v1"  # bump when preprocess_text changes, invalidates cached embeddings
+CHUNK_SIZE = 1024  # documents encoded and flushed to disk per step
+BATCH_SIZE = 64  # model batch size
+NUM_WORKERS = max(1, (os.cpu_count() or 1) // 4)  # encoder processes; 1 disables the multi-process pool
+NORMALIZE = True  # store unit vectors, so inner-product indexes score cosine similarity
 
 model = SentenceTransformer(MODEL_NAME)
+embedding_cache = EmbeddingCache(MODEL_NAME, PREPROCESS_VERSION)
 
 # ---------------------------
 # TEXT PREPROCESSING FUNCTION
@@ -70,39 +82,169 @@ def detect_language(text):
         return "unknown"
 
 # ---------------------------
-# MAIN EMBEDDING GENERATION
+# STREAMING HELPERS
 # ---------------------------
-if __name__ == "__main__":
-    print("[INFO] Loading dataset...")
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    print(f"[INFO] Processing {len(data)} entries...")
-    texts = []
-    for i, entry in enumerate(data):
-        entry["id"] = entry.get("id", f"snippet_{i:04d}")
-        text = entry.get("text", "")
-        processed = preprocess_text(text)
-        entry["processed_text"] = processed
-
-        # Detect language
-        entry["language"] = detect_language(processed)
-
-        # Ensure metadata
-        entry.setdefault("source", "unknown")
-        entry.setdefault("domain", "unknown")
-        entry.setdefault("credibility_score", calculate_credibility(entry))  # default credibility
-
-        texts.append(processed)
+def prepare_entry(entry, i):
+    entry["id"] = entry.get("id", f"snippet_{i:04d}")
+    processed = preprocess_text(entry.get("text", ""))
+    entry["processed_text"] = processed
+
+    # Detect language
+    entry["language"] = detect_language(processed)
+
+    # Ensure metadata
+    entry.setdefault("source", "unknown")
+    entry.setdefault("domain", "unknown")
+    entry.setdefault("credibility_score", calculate_credibility(entry))  # default credibility
+    entry["group"] = tag_group(entry)  # voice group, a backend search facet
+    return entry
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def iter_chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class PoolEncoder:
+    """
+    `encode`-compatible wrapper around sentence-transformers' multi-process
+    pool, so it can sit behind the embedding cache like the plain model.
+    """
+
+    def __init__(self, model, num_workers):
+        self.model = model
+        # Each worker would otherwise start one torch thread per core;
+        # spawned workers read OMP_NUM_THREADS when they import torch
+        previous = os.environ.get("OMP_NUM_THREADS")
+        os.environ["OMP_NUM_THREADS"] = str(max(1, (os.cpu_count() or 1) // num_workers))
+        try:
+            self.pool = model.start_multi_process_pool(target_devices=["cpu"] * num_workers)
+        finally:
+            if previous is None:
+                del os.environ["OMP_NUM_THREADS"]
+            else:
+                os.environ["OMP_NUM_THREADS"] = previous
+
+    def encode(self, texts, batch_size=BATCH_SIZE, **_):
+        return self.model.encode_multi_process(texts, self.pool, batch_size=batch_size)
+
+    def get_sentence_embedding_dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def close(self):
+        self.model.stop_multi_process_pool(self.pool)
+
+
+def checkpoint_path(base):
+    return base + ".checkpoint.json"
+
+
+def partial_embeddings_path(base):
+    return embeddings_path(base) + ".partial"
+
+
+def load_checkpoint(base, input_file, total, dim):
+    """
+    Rows already written by an interrupted run of the same input, or 0.
+    """
+    path = checkpoint_path(base)
+    if not (os.path.exists(path) and os.path.exists(partial_embeddings_path(base))):
+        return 0
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("input_mtime") != os.path.getmtime(input_file) or state.get("total") != total \
+            or state.get("dim") != dim:
+        print("[INFO] Input changed since the last checkpoint, starting over.")
+        return 0
+    return state["done"]
+
+
+def save_checkpoint(base, input_file, total, dim, done):
+    path = checkpoint_path(base)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"input_mtime": os.path.getmtime(input_file), "total": total, "dim": dim, "done": done}, f)
+    os.replace(path + ".tmp", path)
+
+
+def finalize_embeddings(base, total, dim):
+    """
+    Move the float32 working matrix into place, converting it chunk by
+    chunk when the corpus is stored in another dtype (EMBEDDING_DTYPE).
+    """
+    partial = partial_embeddings_path(base)
+    if np.dtype(EMBEDDING_DTYPE) == np.float32:
+        os.replace(partial, embeddings_path(base))
+        return
+    source = np.load(partial, mmap_mode="r")
+    target = np.lib.format.open_memmap(embeddings_path(base) + ".tmp", mode="w+",
+                                       dtype=EMBEDDING_DTYPE, shape=(total, dim))
+    for start in range(0, total, CHUNK_SIZE):
+        target[start:start + CHUNK_SIZE] = source[start:start + CHUNK_SIZE]
+    target.flush()
+    del source, target
+    os.replace(embeddings_path(base) + ".tmp", embeddings_path(base))
+    os.remove(partial)
 
-    print("[INFO] Generating embeddings...")
-    embeddings = model.encode(texts, show_progress_bar=True)
 
-    for i, entry in enumerate(data):
-        entry["embedding"] = embeddings[i].tolist()
-
-    print(f"[INFO] Saving embeddings to {OUTPUT_FILE}...")
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+# ---------------------------
+# MAIN EMBEDDING GENERATION
+# ---------------------------
+if __name__ == "__main__":
+    total = count_documents(INPUT_FILE)
+    dim = model.get_sentence_embedding_dimension()
+    print(f"[INFO] Processing {total} entries in chunks of {CHUNK_SIZE}...")
+
+    # Resume at a chunk boundary: chunk n's records are part file n
+    done = load_checkpoint(OUTPUT_BASE, INPUT_FILE, total, dim)
+    done -= done % CHUNK_SIZE
+    if not all(os.path.exists(part_path(OUTPUT_BASE, part)) for part in range(done // CHUNK_SIZE)):
+        done = 0  # checkpoint from before records were written per chunk
+    if done:
+        print(f"[INFO] Resuming from checkpoint: {done}/{total} already embedded.")
+    elif os.path.isdir(parts_dir(OUTPUT_BASE)):
+        shutil.rmtree(parts_dir(OUTPUT_BASE))
+    # Vectors go straight into an on-disk float32 matrix and each chunk's
+    # records into a part file, so memory stays flat no matter how large
+    # the corpus gets.
+    embeddings = np.lib.format.open_memmap(
+        partial_embeddings_path(OUTPUT_BASE), mode="r+" if done else "w+",
+        dtype=np.float32, shape=(total, dim)
+    )
+
+    encoder = PoolEncoder(model, NUM_WORKERS) if NUM_WORKERS > 1 else model
+    num_parts = -(-total // CHUNK_SIZE)
+    try:
+        for part, chunk in enumerate(tqdm(iter_chunks(iter_documents(INPUT_FILE), CHUNK_SIZE),
+                                          total=num_parts, desc="Embedding")):
+            start = part * CHUNK_SIZE
+            if start + len(chunk) <= done:
+                continue
+            chunk = [prepare_entry(entry, start + j) for j, entry in enumerate(chunk)]
+            texts = [entry["processed_text"] for entry in chunk]
+            vectors = embedding_cache.encode(encoder, texts, batch_size=BATCH_SIZE, show_progress_bar=False)
+            embeddings[start:start + len(chunk)] = normalize_rows(vectors) if NORMALIZE else vectors
+            embeddings.flush()
+            save_records_part(OUTPUT_BASE, part, chunk)
+            save_checkpoint(OUTPUT_BASE, INPUT_FILE, total, dim, start + len(chunk))
+    finally:
+        if encoder is not model:
+            encoder.close()
+
+    print(f"[INFO] Saving embeddings to {records_path(OUTPUT_BASE)}...")
+    del embeddings
+    merge_record_parts(OUTPUT_BASE, num_parts)
+    finalize_embeddings(OUTPUT_BASE, total, dim)
+    os.remove(checkpoint_path(OUTPUT_BASE))
 
     print("[INFO] ✅ Embeddings generated and saved.")
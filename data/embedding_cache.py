@@ -0,0 +1,83 @@
+# embedding_cache.py
+#
+# Persistent embedding cache shared by the pipeline, backend and frontend.
+# Vectors are float32 blobs in SQLite keyed by (model, preprocessing
+# version, sha256(text)), so re-running a stage only encodes unseen text.
+
+import hashlib
+import os
+import sqlite3
+import threading
+import numpy as np
+
+DEFAULT_PATH = os.environ.get(
+    "EQUINET_EMBEDDING_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_cache.sqlite")
+)
+SQLITE_MAX_VARS = 900  # stay under SQLite's bound-parameter limit
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, model_name, version, path=DEFAULT_PATH):
+        self.model_name = model_name
+        self.version = version
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, version TEXT NOT NULL, text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL, PRIMARY KEY (model, version, text_hash))"
+        )
+        self.conn.commit()
+
+    def get_many(self, hashes):
+        """
+        {hash: vector} for the hashes present in the cache.
+        """
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self.lock:
+            for start in range(0, len(unique), SQLITE_MAX_VARS):
+                chunk = unique[start:start + SQLITE_MAX_VARS]
+                rows = self.conn.execute(
+                    "SELECT text_hash, vector FROM embeddings WHERE model = ? AND version = ?"
+                    f" AND text_hash IN ({','.join('?' * len(chunk))})",
+                    [self.model_name, self.version, *chunk]
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, hashes, vectors):
+        rows = [(self.model_name, self.version, h, np.asarray(v, dtype=np.float32).tobytes())
+                for h, v in zip(hashes, vectors)]
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self.conn.commit()
+
+    def encode(self, model, texts, **encode_kwargs):
+        """
+        float32 [len(texts), dim] embeddings, running `model.encode` only
+        on texts that aren't cached yet.
+        """
+        hashes = [text_hash(t) for t in texts]
+        found = self.get_many(hashes)
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in found:
+                missing.setdefault(h, t)
+        if missing:
+            print(f"[INFO] Embedding cache: {len(found)} hits, {len(missing)} to encode.")
+            vectors = np.asarray(model.encode(list(missing.values()), **encode_kwargs), dtype=np.float32)
+            self.put_many(list(missing), vectors)
+            found.update(zip(missing, vectors))
+        if not texts:
+            return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.stack([found[h] for h in hashes])
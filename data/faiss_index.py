@@ -1,19 +1,12 @@
-import faiss
-import numpy as np
-import json
+from index_builder import build_index, save_index
+from corpus_store import load_corpus
 
-with open("embedded_dataset.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
+INDEX_TYPE = "flat"  # "flat", "ivf", "ivfpq", "hnsw", or compressed "fp16" / "sq8" / "pq" (see index_builder.py)
+METRIC = "ip"  # "ip" = cosine over the unit vectors embed.py stores, or "l2"
 
-dim = len(data[0]["embedding"])
-index = faiss.IndexFlatL2(dim)  # L2 distance index
+data, embeddings = load_corpus("embedded_dataset")
+index, index_params = build_index(embeddings, INDEX_TYPE, metric=METRIC)
 
-embeddings = np.array([entry["embedding"] for entry in data], dtype="float32")
-index.add(embeddings)
-
-faiss.write_index(index, "equinet_faiss.index")
-
-with open("embedded_dataset.json", "w", encoding="utf-8") as f:
-    json.dump(data, f, indent=2, ensure_ascii=False)
+save_index(index, index_params, "equinet_faiss.index", vectors=embeddings)
 
 print(f"[INFO] FAISS index stored with {index.ntotal} entries.")
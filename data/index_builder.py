@@ -0,0 +1,318 @@
+import json
+import math
+import os
+import faiss
+import numpy as np
+
+# ---------------------------
+# INDEX TYPES
+# ---------------------------
+# "flat"    exact brute-force search (default, fine for small corpora)
+# "ivf"     IVF-Flat: k-means coarse quantizer, searches `nprobe` lists
+# "ivfpq"   IVF-PQ: IVF with product-quantized residuals, lowest memory
+# "hnsw"    HNSW graph, no training, searches with `efSearch`
+# "fp16"    brute force over float16 codes, 1/2 the memory of "flat"
+# "sq8"     brute force over 8-bit scalar-quantized codes, 1/4 the memory
+# "pq"      brute force over product-quantized codes, pq_m bytes per vector
+INDEX_TYPES = ("flat", "ivf", "ivfpq", "hnsw", "fp16", "sq8", "pq")
+# Lossy types: search over-fetches and re-scores against full-precision
+# vectors saved next to the index (see exact_rerank)
+COMPRESSED_TYPES = ("ivfpq", "fp16", "sq8", "pq")
+
+# "ip"      inner product over L2-normalized vectors = cosine similarity,
+#           higher is better (default; embed.py stores unit vectors)
+# "l2"      squared L2 distance, lower is better (indexes built before metric modes)
+METRICS = {"ip": faiss.METRIC_INNER_PRODUCT, "l2": faiss.METRIC_L2}
+
+
+def params_path(index_file):
+    return index_file + ".params.json"
+
+
+def default_nlist(n):
+    # ~4*sqrt(N) lists, but keep at least 39 training points per list
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def vectors_path(index_file):
+    return index_file + ".vectors.npy"
+
+
+def default_pq_m(dim):
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def normalize_rows(vectors):
+    """
+    float32 copy of `vectors` with unit-length rows.
+    """
+    vectors = np.array(vectors, dtype="float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def index_metric(params):
+    return params.get("metric", "l2")
+
+
+def load_params(index_file):
+    """
+    Params saved next to `index_file`; indexes without a params file are
+    legacy flat L2 indexes over unnormalized vectors.
+    """
+    if not os.path.exists(params_path(index_file)):
+        return {"index_type": "flat"}
+    with open(params_path(index_file), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def normalizes_queries(params):
+    """
+    Whether queries must be L2-normalized before searching the index: for
+    inner product, and for L2 over unit vectors (where the ranking then
+    matches cosine). Legacy L2 indexes were searched with raw queries.
+    """
+    return index_metric(params) == "ip" or params.get("unit_vectors", False)
+
+
+def cosine_scores(queries, D, I, params, index):
+    """
+    Cosine similarities for search results (D, I), whatever the metric.
+    Inner products over unit vectors already are; L2 distances over unit
+    vectors are 1 - d/2; for legacy L2 indexes the hit vectors are
+    reconstructed to recover their norms. Empty (-1) slots get -inf.
+    """
+    D = np.array(D, dtype=np.float32)
+    valid = I >= 0
+    if index_metric(params) == "l2":
+        if params.get("unit_vectors"):
+            D = 1.0 - D / 2.0
+        elif valid.any():
+            queries = np.asarray(queries, dtype=np.float32)
+            q_norms = np.broadcast_to(np.linalg.norm(queries, axis=1)[:, None], I.shape)[valid]
+            v_norms = np.linalg.norm(index.reconstruct_batch(I[valid]), axis=1)
+            # |q - v|^2 = |q|^2 + |v|^2 - 2 q.v
+            dots = (q_norms ** 2 + v_norms ** 2 - D[valid]) / 2.0
+            D[valid] = dots / np.maximum(q_norms * v_norms, 1e-12)
+    D[~valid] = -np.inf
+    return D
+
+
+def build_index(embeddings, index_type="flat", nlist=None, nprobe=8,
+                pq_m=None, pq_nbits=8, hnsw_m=32, ef_construction=200, ef_search=64,
+                ids=None, metric="ip"):
+    """
+    Build (and train, where needed) a FAISS index over `embeddings`.
+    Returns (index, params) where params holds everything needed to
+    search it the same way later.
+
+    With `ids`, vectors are added under those ids, so they can later be
+    removed / replaced. IVF indexes store ids natively; other types are
+    wrapped in an IndexIDMap2.
+
+    With metric="ip" the embeddings must already be L2-normalized, so
+    scores are cosine similarities.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}, expected one of {tuple(METRICS)}")
+
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    n, dim = embeddings.shape
+    params = {"index_type": index_type, "metric": metric, "dim": dim, "ntotal": n}
+    faiss_metric = METRICS[metric]
+
+    if index_type == "flat":
+        index = faiss.IndexFlat(dim, faiss_metric)
+    elif index_type in ("fp16", "sq8"):
+        qtype = faiss.ScalarQuantizer.QT_fp16 if index_type == "fp16" else faiss.ScalarQuantizer.QT_8bit
+        index = faiss.IndexScalarQuantizer(dim, qtype, faiss_metric)
+        index.train(embeddings)
+    elif index_type == "pq":
+        pq_m = pq_m or default_pq_m(dim)
+        pq_nbits = min(pq_nbits, max(1, int(math.log2(max(2, n // 39)))))
+        print(f"[INFO] Training pq index with m={pq_m}, nbits={pq_nbits}...")
+        index = faiss.IndexPQ(dim, pq_m, pq_nbits, faiss_metric)
+        index.train(embeddings)
+        params.update({"pq_m": pq_m, "pq_nbits": pq_nbits})
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss_metric)
+        index.hnsw.efConstruction = ef_construction
+        params.update({"M": hnsw_m, "efConstruction": ef_construction, "efSearch": ef_search})
+    else:
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlat(dim, faiss_metric)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss_metric)
+        else:
+            pq_m = pq_m or default_pq_m(dim)
+            # PQ needs ~39 points per centroid; shrink codebooks on tiny corpora
+            pq_nbits = min(pq_nbits, max(1, int(math.log2(max(2, n // 39)))))
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_nbits, faiss_metric)
+            params.update({"pq_m": pq_m, "pq_nbits": pq_nbits})
+        print(f"[INFO] Training {index_type} index with nlist={nlist}...")
+        index.train(embeddings)
+        params.update({"nlist": nlist, "nprobe": min(nprobe, nlist)})
+
+    if ids is None:
+        index.add(embeddings)
+    else:
+        # IndexIVF.remove_ids doesn't renumber the ids it stores, so an
+        # IndexIDMap2 around it (which compacts id_map) would go stale
+        if not isinstance(index, faiss.IndexIVF):
+            index = faiss.IndexIDMap2(index)
+        index.add_with_ids(embeddings, np.asarray(ids, dtype="int64"))
+        params["id_map"] = True
+    params["compressed"] = index_type in COMPRESSED_TYPES
+    params["unit_vectors"] = bool(np.allclose(np.linalg.norm(embeddings, axis=1), 1.0, atol=1e-3))
+    apply_search_params(index, params)
+    return index, params
+
+
+def index_ids(index):
+    """
+    int64 ids of every vector in `index`, in storage order.
+    """
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.vector_to_array(index.id_map).astype(np.int64)
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return np.arange(index.ntotal, dtype=np.int64)
+    invlists = ivf.invlists
+    lists = [faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+             for l in range(ivf.nlist) if invlists.list_size(l)]
+    return np.concatenate(lists).astype(np.int64) if lists else np.zeros(0, dtype=np.int64)
+
+
+def extract_vectors(index, index_file):
+    """
+    (ids, float32 vectors) for everything in `index`, in bulk. Uses the
+    full-precision vectors saved next to compressed indexes when present,
+    otherwise decodes them from the index (lossy for compressed types).
+    """
+    ids = index_ids(index)
+    if os.path.exists(vectors_path(index_file)):
+        stored = np.load(vectors_path(index_file), mmap_mode="r")
+        return ids, np.asarray(stored[ids], dtype=np.float32)
+    if isinstance(index, faiss.IndexIDMap):
+        return ids, faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+    try:
+        # Ids of an IVF needn't be contiguous, so look them up through a hash map
+        faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.Hashtable)
+        return ids, index.reconstruct_batch(ids)
+    except RuntimeError:
+        return ids, index.reconstruct_n(0, index.ntotal)
+
+
+def index_bytes(index):
+    """
+    Serialized size of `index`, a close proxy for its resident memory.
+    """
+    return int(faiss.serialize_index(index).size)
+
+
+def exact_rerank(queries, I, vectors, k, metric="ip"):
+    """
+    Re-score over-fetched candidates `I` [n, k'] against full-precision
+    `vectors` (float32 / float16, may be a memmap; row = FAISS id) and
+    keep the best k. Returns (D, I) like `index.search`.
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    valid = I >= 0
+    rows = np.where(valid, I, 0)
+    unique, inverse = np.unique(rows, return_inverse=True)
+    candidates = np.asarray(vectors[unique], dtype=np.float32)[inverse.reshape(rows.shape)]
+    if metric == "ip":
+        D = np.einsum("nkd,nd->nk", candidates, queries)
+        D[~valid] = -np.inf
+        order = np.argsort(-D, axis=1)[:, :k]
+    else:
+        D = ((candidates - queries[:, None, :]) ** 2).sum(axis=2)
+        D[~valid] = np.inf
+        order = np.argsort(D, axis=1)[:, :k]
+    return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+
+def supports_removal(index):
+    """
+    Whether vectors can be removed in place: IVF indexes holding their
+    own ids, or IndexIDMap-wrapped flat / quantized indexes. HNSW graphs
+    can't remove, and an IDMap around an IVF (older builds) breaks on removal.
+    """
+    if isinstance(index, faiss.IndexIDMap):
+        inner = faiss.downcast_index(index.index)
+        return not isinstance(inner, (faiss.IndexHNSW, faiss.IndexIVF))
+    return isinstance(index, faiss.IndexIVF)
+
+
+def search_parameters(index, params, selector):
+    """
+    FAISS search parameters restricting the search to `selector`, using the
+    parameter type the index expects so nprobe / efSearch still apply.
+    """
+    try:
+        faiss.extract_index_ivf(index)
+        return faiss.SearchParametersIVF(sel=selector, nprobe=params.get("nprobe", 1))
+    except RuntimeError:
+        pass
+    if params.get("index_type") == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=params.get("efSearch", 16))
+    return faiss.SearchParameters(sel=selector)
+
+
+def supports_selectors(index):
+    # IndexPQ's search takes no SearchParameters at all
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    return not isinstance(inner, faiss.IndexPQ)
+
+
+def filtered_search(index, params, queries, k, mask, overfetch=2):
+    """
+    Search restricted to the ids where the boolean `mask` is set, pushed
+    into FAISS as an id bitmap. Index types without selector support (pq)
+    over-fetch in proportion to how selective the mask is and drop rows
+    outside it. Returns (D, I) like `index.search`.
+    """
+    queries = np.asarray(queries, dtype="float32")
+    if not mask.any():
+        return np.full((len(queries), k), np.inf, dtype="float32"), np.full((len(queries), k), -1, dtype="int64")
+    if supports_selectors(index):
+        # The bitmap must outlive the search
+        bitmap = np.packbits(mask, bitorder="little")
+        selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+        return index.search(queries, k, params=search_parameters(index, params, selector))
+    fetch = min(index.ntotal, int(np.ceil(k * overfetch * len(mask) / mask.sum())))
+    D, I = index.search(queries, max(fetch, k))
+    keep = (I >= 0) & mask[np.clip(I, 0, len(mask) - 1)]
+    order = np.argsort(~keep, axis=1, kind="stable")[:, :k]
+    D, I = np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+    I[~np.take_along_axis(keep, order, axis=1)] = -1
+    return D, I
+
+
+def apply_search_params(index, params):
+    """
+    Set search-time knobs (nprobe / efSearch) recorded at build time.
+    """
+    space = faiss.ParameterSpace()
+    for name in ("nprobe", "efSearch"):
+        if name in params:
+            space.set_index_parameter(index, name, params[name])
+
+
+def save_index(index, params, index_file, vectors=None):
+    """
+    Write the index and its params. For compressed indexes, pass the
+    full-precision `vectors` (row = FAISS id) to keep them on disk for
+    exact re-ranking.
+    """
+    faiss.write_index(index, index_file)
+    if vectors is not None and params.get("compressed"):
+        np.save(vectors_path(index_file), np.ascontiguousarray(vectors, dtype=np.float32))
+    with open(params_path(index_file), "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=2)
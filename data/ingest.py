@@ -0,0 +1,269 @@
+# ingest.py
+#
+# Incremental ingestion: diff passages_dataset.jsonl against the existing
+# clustered corpus by content hash, embed only new / modified documents,
+# and patch the FAISS index and metadata in place.
+#
+#   python ingest.py            # incremental update
+#   python ingest.py --rebuild  # rebuild the id-mapped index from stored vectors (no re-embedding)
+#
+# FAISS ids are row positions in the clustered corpus. Rows are never
+# renumbered: modified documents are updated in place and deleted ones are
+# kept as tombstones ("deleted": true) whose vectors are removed from the index.
+
+import argparse
+import json
+import os
+import faiss
+import numpy as np
+from corpus_store import exists, load_corpus, save_corpus, records_path, content_hash, document_key, \
+    iter_documents
+from index_builder import build_index, save_index, supports_removal, normalize_rows, load_params
+from cluster_engine import assign
+from bm25 import BM25Index
+from bias_align import load_offsets, OFFSETS_FILE
+from cluster_stats import compute_stats, load_stats, save_stats, STATS_FILE, CENTROIDS_FILE
+
+# ---------------------------
+# CONFIG
+# ---------------------------
+INPUT_FILE = "passages_dataset.jsonl"  # chunk.py output
+CORPUS_BASE = "clustered_dataset"  # corpus_store base name
+FAISS_INDEX_FILE = "equinet_faiss.index"
+METADATA_FILE = "equinet_metadata.json"
+OUTPUT_FILE = "output.json"  # metadata + text, served by the backend
+BM25_FILE = "equinet_bm25.npz"  # rebuilt in full, takes seconds
+INDEX_TYPE = "flat"  # used when the index has to be (re)built; "sq8" / "fp16" / "pq" to compress
+METRIC = "ip"  # "ip" (cosine over unit vectors) or "l2", used when the index has to be (re)built
+FAIRNESS_THRESHOLD = None  # same (optional) pruning rule as weighting.py
+DELETE_MISSING = True  # treat INPUT_FILE as a full snapshot
+ALIGN_GROUPS = False  # apply bias_align.py's group offsets; set when CORPUS_BASE was built from the aligned corpus
+
+
+# ---------------------------
+# CHANGE DETECTION
+# ---------------------------
+def plan_changes(records, incoming):
+    """
+    Returns (new, modified, deleted): new entries, (row, entry) pairs whose
+    text changed, and rows of documents no longer present.
+    """
+    rows_by_key = {r["doc_key"]: i for i, r in enumerate(records) if not r.get("deleted")}
+    new, modified, seen = [], [], set()
+    for entry in incoming:
+        key = document_key(entry)
+        if key in seen:
+            continue
+        seen.add(key)
+        row = rows_by_key.get(key)
+        if row is None:
+            new.append(entry)
+        elif records[row]["content_hash"] != content_hash(entry.get("text", "")):
+            modified.append((row, entry))
+    deleted = [row for key, row in rows_by_key.items() if key not in seen] if DELETE_MISSING else []
+    return new, modified, deleted
+
+
+def prepare(entry, number, row_id=None):
+    """
+    embed.py's per-entry processing, which keeps an incoming id (chunk.py's
+    passage ids) and falls back to snippet_<number>. Modified documents keep
+    the id of the row they replace.
+    """
+    from embed import prepare_entry
+    record = prepare_entry(dict(entry), number)
+    if row_id is not None:
+        record["id"] = row_id
+    record["doc_key"] = document_key(entry)
+    record["content_hash"] = content_hash(entry.get("text", ""))
+    return record
+
+
+def next_snippet_number(records):
+    numbers = [int(r["id"].rsplit("_", 1)[-1]) for r in records
+               if r.get("id", "").startswith("snippet_") and r["id"].rsplit("_", 1)[-1].isdigit()]
+    return max(numbers, default=-1) + 1
+
+
+def align_vectors(vectors, changed_records):
+    """
+    Normalise and shift new vectors by their group's offset, then
+    re-normalize, as bias_align.py did for the rest of the corpus.
+    """
+    offsets = load_offsets(OFFSETS_FILE)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    shift = np.stack([offsets.get(r["group"], np.zeros(vectors.shape[1], dtype=np.float32))
+                      for r in changed_records])
+    return normalize_rows(vectors + shift)
+
+
+# ---------------------------
+# INDEX
+# ---------------------------
+def indexed_rows(records):
+    return np.array([i for i, r in enumerate(records)
+                     if not r.get("deleted") and (FAIRNESS_THRESHOLD is None
+                                                  or r.get("fairness_score", 1.0) >= FAIRNESS_THRESHOLD)],
+                    dtype="int64")
+
+
+def rebuild_index(records, embeddings):
+    rows = indexed_rows(records)
+    print(f"[INFO] Building {INDEX_TYPE} index with row-position ids over {len(rows)} rows...")
+    return build_index(embeddings[rows], INDEX_TYPE, ids=rows, metric=METRIC)
+
+
+def load_index():
+    if not os.path.exists(FAISS_INDEX_FILE):
+        return None, None
+    index = faiss.read_index(FAISS_INDEX_FILE)
+    params = load_params(FAISS_INDEX_FILE)
+    # Indexes built without row-position ids (weighting.py) are rebuilt once
+    if not (params.get("id_map") and supports_removal(index)):
+        return None, params
+    return index, params
+
+
+# ---------------------------
+# CLUSTERS
+# ---------------------------
+def refresh_fairness(records, embeddings, centroids):
+    """
+    Recompute cluster stats over the live rows against the fixed centroids
+    and update every live record's fairness_score. Rows already in the
+    index keep their index membership until the next --rebuild.
+    """
+    live = np.array([i for i, r in enumerate(records) if not r.get("deleted")], dtype=np.int64)
+    labels = np.array([records[i]["cluster"] for i in live], dtype=np.int64)
+    stats = compute_stats(embeddings, labels, centroids, rows=live)
+    scores = np.array([c["fairness_score"] for c in stats["clusters"]])
+    for i, score in zip(live.tolist(), scores[labels].tolist()):
+        records[i]["fairness_score"] = score
+    save_stats(stats, centroids)
+    print(f"[INFO] Cluster stats refreshed in {STATS_FILE}.")
+
+
+# ---------------------------
+# OUTPUT
+# ---------------------------
+def save_metadata(records):
+    metadata = [
+        {
+            "id": r["id"],
+            "source": r.get("source", "unknown"),
+            "domain": r.get("domain", "unknown"),
+            "language": r.get("language", "unknown"),
+            "cluster": r.get("cluster", -1),
+            "fairness_score": r.get("fairness_score", 1.0),
+            **({"deleted": True} if r.get("deleted") else {})
+        }
+        for r in records
+    ]
+    with open(METADATA_FILE, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False)
+    # Tombstones keep their row position (record position = FAISS id) but
+    # nothing else: their text and facet values must not be served
+    served = [{"id": r["id"], "deleted": True} if r.get("deleted") else r for r in records]
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+        json.dump(served, f, ensure_ascii=False)
+
+
+# ---------------------------
+# MAIN
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental EquiNet ingestion")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index from stored vectors")
+    args = parser.parse_args()
+
+    if not exists(CORPUS_BASE):
+        raise SystemExit(f"[ERROR] {records_path(CORPUS_BASE)} not found, run the full pipeline first.")
+    records, embeddings = load_corpus(CORPUS_BASE, mmap=False)
+    embeddings = np.asarray(embeddings, dtype="float32")  # the corpus may be stored as float16
+    for r in records:
+        # Corpora written before incremental ingestion have no hashes yet
+        r.setdefault("doc_key", document_key(r))
+        r.setdefault("content_hash", content_hash(r.get("text", "")))
+
+    index, params = (None, None) if args.rebuild else load_index()
+    if index is None:
+        index, params = rebuild_index(records, embeddings)
+
+    has_centroids = os.path.exists(STATS_FILE) and os.path.exists(CENTROIDS_FILE)
+    if has_centroids:
+        _, centroids, _ = load_stats()
+
+    incoming = list(iter_documents(INPUT_FILE))
+    new, modified, deleted = plan_changes(records, incoming)
+    print(f"[INFO] {len(new)} new, {len(modified)} modified, {len(deleted)} deleted documents.")
+
+    if new or modified:
+        from embed import model, embedding_cache, NORMALIZE
+        number = next_snippet_number(records)
+        changed_rows, changed_records = [], []
+        for row, entry in modified:
+            changed_rows.append(row)
+            changed_records.append(prepare(entry, number, records[row]["id"]))
+        for j, entry in enumerate(new):
+            changed_rows.append(len(records) + j)
+            changed_records.append(prepare(entry, number))
+            if "id" not in entry:
+                number += 1
+
+        print(f"[INFO] Embedding {len(changed_records)} documents...")
+        vectors = embedding_cache.encode(model, [r["processed_text"] for r in changed_records],
+                                         show_progress_bar=True)
+        if ALIGN_GROUPS:
+            vectors = align_vectors(vectors, changed_records)
+        elif NORMALIZE:
+            vectors = normalize_rows(vectors)
+
+        if has_centroids:
+            # Label against the existing centroids; fairness is refreshed below
+            for record, label in zip(changed_records, assign(vectors, centroids).tolist()):
+                record["cluster"] = label
+        else:
+            # Without cluster stats, inherit cluster / fairness from the nearest indexed neighbour
+            if index.ntotal:
+                _, nearest = index.search(vectors, 1)
+            else:
+                nearest = np.full((len(vectors), 1), -1)
+            for record, neighbour in zip(changed_records, nearest[:, 0]):
+                if neighbour >= 0:
+                    record["cluster"] = records[neighbour].get("cluster", -1)
+                    record["fairness_score"] = records[neighbour].get("fairness_score", 1.0)
+                else:
+                    record.setdefault("cluster", -1)
+                    record.setdefault("fairness_score", 1.0)
+
+        num_new = len(new)
+        if num_new:
+            embeddings = np.vstack([embeddings, np.zeros((num_new, embeddings.shape[1]), dtype="float32")])
+            records.extend([None] * num_new)
+        for row, record, vector in zip(changed_rows, changed_records, vectors):
+            records[row] = record
+            embeddings[row] = vector
+
+    stale = np.array([row for row, _ in modified] + deleted, dtype="int64")
+    if len(stale):
+        index.remove_ids(stale)
+    for row in deleted:
+        records[row]["deleted"] = True
+
+    if has_centroids and (new or modified or deleted):
+        refresh_fairness(records, embeddings, centroids)
+
+    if new or modified:
+        live = set(indexed_rows(records).tolist())
+        add_rows = np.array([row for row in changed_rows if row in live], dtype="int64")
+        if len(add_rows):
+            index.add_with_ids(embeddings[add_rows], add_rows)
+
+    save_corpus(CORPUS_BASE, records, embeddings)
+    save_index(index, params, FAISS_INDEX_FILE, vectors=embeddings)
+    save_metadata(records)
+    BM25Index.build([
+        "" if r.get("deleted") else r.get("text", "") for r in records
+    ]).save(BM25_FILE)
+    print(f"[INFO] ✅ Index now holds {index.ntotal} vectors over {len(records)} rows.")
@@ -1,42 +1,110 @@
 # pdf_extractor.py
 
 import pdfplumber
+import hashlib
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from langdetect import detect
 
 PDF_FOLDER = "./pdf_reports/"
 OUTPUT_FILE = "pdf_dataset.json"
+CACHE_DIR = "./pdf_cache/"  # per-page extraction results, keyed by file hash
+CACHE_INDEX = os.path.join(CACHE_DIR, "index.json")  # path -> size / mtime / sha256
+MAX_WORKERS = os.cpu_count() or 1
+LANGDETECT_CHARS = 10000  # language is detected on a prefix, not the whole report
 
-def extract_pdf_text(pdf_path):
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def pages_path(sha):
+    return os.path.join(CACHE_DIR, f"{sha}.jsonl")
+
+def extract_pdf_pages(pdf_path, out_path):
+    """
+    Extract a PDF page by page, streaming each page to `out_path` as a
+    JSON line so memory stays bounded by a single page. Runs in a worker process.
+    """
+    tmp_path = out_path + f".tmp{os.getpid()}"
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            text = ""
-            for page in pdf.pages:
+        with pdfplumber.open(pdf_path) as pdf, open(tmp_path, "w", encoding="utf-8") as out:
+            for number, page in enumerate(pdf.pages, start=1):
                 page_text = page.extract_text()
                 if page_text:
-                    text += page_text + "\n"
-
-        return text.strip()
+                    out.write(json.dumps({"page": number, "text": page_text}, ensure_ascii=False) + "\n")
+                page.flush_cache()
+        os.replace(tmp_path, out_path)
+        return True
     except Exception as e:
         print(f"[ERROR] Failed to extract {pdf_path}: {e}")
-        return None
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+def load_pages(sha):
+    with open(pages_path(sha), "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def load_cache_index():
+    if os.path.exists(CACHE_INDEX):
+        with open(CACHE_INDEX, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def resolve_hash(path, cache_index):
+    """
+    File hash, reusing the cached one while size and mtime are unchanged.
+    """
+    stat = os.stat(path)
+    cached = cache_index.get(path)
+    if cached and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime:
+        return cached["sha256"]
+    sha = file_sha256(path)
+    cache_index[path] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha}
+    return sha
 
 def process_pdfs():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cache_index = load_cache_index()
+
+    files = sorted(f for f in os.listdir(PDF_FOLDER) if f.endswith(".pdf"))
+    hashes = {f: resolve_hash(os.path.join(PDF_FOLDER, f), cache_index) for f in files}
+    todo = [f for f in files if not os.path.exists(pages_path(hashes[f]))]
+    print(f"[INFO] {len(files)} PDFs, {len(files) - len(todo)} unchanged, {len(todo)} to extract.")
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=min(MAX_WORKERS, len(todo))) as pool:
+            futures = {
+                pool.submit(extract_pdf_pages, os.path.join(PDF_FOLDER, f), pages_path(hashes[f])): f
+                for f in todo
+            }
+            for future in as_completed(futures):
+                if future.result():
+                    print(f"[INFO] Extracted {futures[future]}")
+
+    with open(CACHE_INDEX, "w", encoding="utf-8") as f:
+        json.dump(cache_index, f, indent=2)
+
     data = []
-    for filename in os.listdir(PDF_FOLDER):
-        if filename.endswith(".pdf"):
-            path = os.path.join(PDF_FOLDER, filename)
-            text = extract_pdf_text(path)
-            if text:
-                entry = {
-                    "source": "PDF Report",
-                    "file_name": filename,
-                    "text": text,
-                    "language": detect(text),
-                    "date": None  # optional: add if known
-                }
-                data.append(entry)
+    for filename in files:
+        if not os.path.exists(pages_path(hashes[filename])):
+            continue
+        pages = load_pages(hashes[filename])
+        text = "\n".join(p["text"] for p in pages).strip()
+        if text:
+            entry = {
+                "source": "PDF Report",
+                "file_name": filename,
+                "text": text,
+                "pages": pages,  # per-page text with page numbers, used by preprocess/chunk
+                "language": detect(text[:LANGDETECT_CHARS]),
+                "date": None  # optional: add if known
+            }
+            data.append(entry)
     return data
 
 if __name__ == "__main__":
@@ -4,16 +4,44 @@ import re
 with open("combined_dataset.json", "r", encoding="utf-8") as f:
     data = json.load(f)
 
+def normalize(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+def join_parts(parts, fields):
+    """
+    Normalized document text plus, for each non-empty part, its `fields`
+    and character span in the text, so chunk.py can tag passages with
+    page numbers (PDF pages) or time ranges (transcript segments).
+    """
+    texts, spans, offset = [], [], 0
+    for part in parts:
+        part_text = normalize(part["text"])
+        if not part_text:
+            continue
+        if texts:
+            offset += 1  # joining space
+        spans.append({**{k: part[k] for k in fields}, "char_start": offset, "char_end": offset + len(part_text)})
+        texts.append(part_text)
+        offset += len(part_text)
+    return " ".join(texts), spans
+
 processed_data = []
 for entry in data:
     if "text" in entry and len(entry["text"].split()) > 50:
-        text = re.sub(r"\s+", " ", entry["text"]).strip()
-        processed_data.append({
-            "text": text,
+        record = {
             "source": entry.get("source"),
             "language": entry.get("language"),
             "metadata": {k: entry.get(k) for k in ["title", "authors", "date", "keywords"] if entry.get(k)}
-        })
+        }
+        if entry.get("pages"):
+            record["text"], record["pages"] = join_parts(entry["pages"], ["page"])
+        elif entry.get("segments"):
+            record["text"], record["segments"] = join_parts(entry["segments"], ["start", "end"])
+        else:
+            record["text"] = normalize(entry["text"])
+        if entry.get("file_name"):
+            record["file_name"] = entry["file_name"]
+        processed_data.append(record)
 
 with open("processed_dataset.json", "w", encoding="utf-8") as f:
     json.dump(processed_data, f, indent=2, ensure_ascii=False)
@@ -1,27 +1,47 @@
 from sentence_transformers import SentenceTransformer
 import faiss
-import numpy as np
-import json
+from corpus_store import load_records
+from embedding_cache import EmbeddingCache
+from index_builder import load_params, normalizes_queries, normalize_rows
 
-model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+MODEL_NAME = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+model = SentenceTransformer(MODEL_NAME)
+query_cache = EmbeddingCache(MODEL_NAME, "query-v1")
 index = faiss.read_index("equinet_faiss.index")
+index_params = load_params("equinet_faiss.index")
 
-with open("embedded_dataset.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
+data = load_records("embedded_dataset")
 
-def query_equiNet(query, k=5):
-    query_vec = model.encode([query])
-    D, I = index.search(np.array(query_vec).astype("float32"), k)
-    results = []
+def query_equiNet(query, k=5, group_documents=False, overfetch=4):
+    """
+    Top-k passages for `query`, or with `group_documents` the top-k parent
+    documents (best passage per document).
+    """
+    query_vec = query_cache.encode(model, [query], show_progress_bar=False)
+    if normalizes_queries(index_params):
+        query_vec = normalize_rows(query_vec)
+    D, I = index.search(query_vec, k * overfetch if group_documents else k)
+    results, seen = [], set()
     for idx in I[0]:
+        if idx < 0:
+            continue
+        parent = data[idx].get("parent_id", data[idx].get("id"))
+        if group_documents:
+            if parent in seen:
+                continue
+            seen.add(parent)
         results.append({
             "text": data[idx]["text"][:500] + "...",
             "source": data[idx]["source"],
+            "parent_id": parent,
             "metadata": data[idx].get("metadata", {})
         })
+        if len(results) == k:
+            break
     return results
 
-# Example query
-results = query_equiNet("indigenous climate adaptation")
-for r in results:
-    print(r["text"], "\nSource:", r["source"], "\n---")
+if __name__ == "__main__":
+    # Example query
+    results = query_equiNet("indigenous climate adaptation")
+    for r in results:
+        print(r["text"], "\nSource:", r["source"], "\n---")
@@ -6,6 +6,7 @@ from newspaper import Article
 from datetime import datetime
 from langdetect import detect
 import nltk 
+from crawler import Crawler
 nltk.download('punkt_tab')
 
 # -----------------------------
@@ -36,14 +37,30 @@ BLOG_URLS = [
 
 OUTPUT_FILE = "blogs_dataset.json"
 MAX_ARTICLES_PER_SITE = 20  # limit to speed up crawling for hackathon
+MAX_WORKERS = 16  # concurrent downloads overall
+PER_HOST_LIMIT = 4  # concurrent downloads per site
+
+crawler = Crawler(max_workers=MAX_WORKERS, per_host=PER_HOST_LIMIT)
 
 # -----------------------------
 # FUNCTIONS
 # -----------------------------
-def crawl_article(url):
+def crawl_article(url, saved_urls=()):
+    """
+    Returns the parsed article, or None if it failed or is unchanged
+    since the last crawl and already saved. Unchanged pages that never
+    made it into the output (e.g. a run that crashed before saving) are
+    parsed from the cached body.
+    """
     try:
+        page = crawler.fetch(url)
+        if page is None:
+            return None
+        if page.unchanged and url in saved_urls:
+            print(f"[INFO] Unchanged, skipping: {url}")
+            return None
         article = Article(url)
-        article.download()
+        article.download(input_html=page.text)
         article.parse()
         article.nlp()
 
@@ -65,38 +82,39 @@ def crawl_article(url):
 
 
 def crawl_site(url, max_articles=20):
+    """
+    Discover article URLs on a site; downloading happens on the crawler pool.
+    """
     from newspaper import build
     print(f"[INFO] Crawling site: {url}")
     site = build(url, memoize_articles=False)
-    articles_data = []
-
-    for article in site.articles[:max_articles]:
-        print(f"[INFO] Crawling article: {article.url}")
-        data = crawl_article(article.url)
-        if data:
-            articles_data.append(data)
-
-    return articles_data
+    return [article.url for article in site.articles[:max_articles]]
 
 
 # -----------------------------
 # MAIN SCRIPT
 # -----------------------------
 if __name__ == "__main__":
-    all_articles = []
-
-    for blog_url in BLOG_URLS:
-        articles = crawl_site(blog_url, MAX_ARTICLES_PER_SITE)
-        all_articles.extend(articles)
-
-    print(f"[INFO] Crawled {len(all_articles)} articles in total.")
+    article_urls = []
+    for _, urls in crawler.map(lambda u: crawl_site(u, MAX_ARTICLES_PER_SITE), BLOG_URLS):
+        article_urls.extend(urls)
+    article_urls = list(dict.fromkeys(article_urls))
 
     if os.path.exists(OUTPUT_FILE):
         with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
             existing_data = json.load(f)
     else:
         existing_data = []
+    saved_urls = {a.get("url") for a in existing_data}
+
+    print(f"[INFO] Crawling {len(article_urls)} articles...")
+    all_articles = [data for _, data in crawler.map(lambda u: crawl_article(u, saved_urls), article_urls) if data]
+
+    print(f"[INFO] Crawled {len(all_articles)} articles in total.")
 
+    # Re-crawled articles replace their previous version
+    crawled = {a["url"] for a in all_articles}
+    existing_data = [a for a in existing_data if a.get("url") not in crawled]
     existing_data.extend(all_articles)
 
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
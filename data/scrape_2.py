@@ -1,9 +1,10 @@
 import os
 import json
-import requests
+import threading
 from bs4 import BeautifulSoup
+from crawler import Crawler
 import wikipedia
-import whisper
+from transcribe import TranscriptionWorker
 import yt_dlp as youtube_dl
 
 # ---------------------------
@@ -24,6 +25,8 @@ PODCAST_URLS = [
 os.makedirs(DATA_DIR, exist_ok=True)
 
 dataset = []
+dataset_lock = threading.Lock()  # scrape_blog runs on the crawler's thread pool
+crawler = Crawler()
 
 # ---------------------------
 # FUNCTION: Scrape Blog / Forum Content
@@ -31,29 +34,35 @@ dataset = []
 def scrape_blog(url):
     print(f"Scraping: {url}")
     try:
-        r = requests.get(url)
-        soup = BeautifulSoup(r.content, "html.parser")
+        page = crawler.fetch(url)
+        if page is None:
+            return
+        soup = BeautifulSoup(page.body, "html.parser")
 
         posts = soup.find_all("article")
-        for post in posts:
-            title = post.find("h2").text if post.find("h2") else "No Title"
-            content = post.get_text(separator=" ", strip=True)
-            dataset.append({
-                "id": f"blog_{len(dataset)+1}",
-                "text": content,
-                "source": url,
-                "domain": "Community Blog",
-                "language": "en",
-                "type": "text"
-            })
+        with dataset_lock:
+            for post in posts:
+                title = post.find("h2").text if post.find("h2") else "No Title"
+                content = post.get_text(separator=" ", strip=True)
+                dataset.append({
+                    "id": f"blog_{len(dataset)+1}",
+                    "text": content,
+                    "source": url,
+                    "domain": "Community Blog",
+                    "language": "en",
+                    "type": "text"
+                })
     except Exception as e:
         print(f"Error scraping {url}: {e}")
 
 # ---------------------------
 # FUNCTION: Download & Transcribe Podcast
 # ---------------------------
-def transcribe_podcast(url, index):
-    print(f"Downloading and transcribing podcast: {url}")
+def download_podcast(url, index):
+    """
+    Download a podcast's audio and return the local file path (or None).
+    """
+    print(f"Downloading podcast: {url}")
     try:
         ydl_opts = {
             "format": "bestaudio/best",
@@ -61,32 +70,45 @@ def transcribe_podcast(url, index):
             "quiet": True
         }
         with youtube_dl.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
+            info = ydl.extract_info(url, download=True)
+            audio_file = ydl.prepare_filename(info)
 
-        audio_file = None
-        for file in os.listdir(DATA_DIR):
-            if file.startswith(f"podcast_{index}") and file.endswith((".webm", ".m4a")):
-                audio_file = os.path.join(DATA_DIR, file)
-                break
-
-        if not audio_file:
+        if not os.path.exists(audio_file):
             print("No podcast file found.")
-            return
+            return None
+        return audio_file
+    except Exception as e:
+        print(f"Error downloading podcast {url}: {e}")
+        return None
+
+def transcribe_podcasts(urls):
+    """
+    Download every podcast, then transcribe them together on the
+    transcription worker (one Whisper model per process, cached by audio hash).
+    """
+    audio_files = {}
+    for i, url in enumerate(urls):
+        audio_file = download_podcast(url, i)
+        if audio_file:
+            audio_files[audio_file] = url
 
-        model = whisper.load_model("base")
-        result = model.transcribe(audio_file)
-        transcript = result["text"]
+    try:
+        transcripts = TranscriptionWorker().transcribe_all(list(audio_files))
+    except Exception as e:
+        print(f"Error transcribing podcasts: {e}")
+        return
 
+    for audio_file, url in audio_files.items():
+        transcript = transcripts[audio_file]
         dataset.append({
             "id": f"podcast_{len(dataset)+1}",
-            "text": transcript,
+            "text": transcript["text"],
             "source": url,
             "domain": "Podcast",
-            "language": "en",
-            "type": "audio_transcript"
+            "language": transcript.get("language") or "en",
+            "type": "audio_transcript",
+            "segments": transcript["segments"]
         })
-    except Exception as e:
-        print(f"Error processing podcast {url}: {e}")
 
 # ---------------------------
 # FUNCTION: Get Wikipedia Dump
@@ -115,12 +137,11 @@ if __name__ == "__main__":
     print("STARTING DATA COLLECTION FOR EquiNet")
 
     # Blog scraping
-    for url in BLOG_URLS:
-        scrape_blog(url)
+    for _ in crawler.map(scrape_blog, BLOG_URLS):
+        pass
 
     # Podcast transcription
-    for i, url in enumerate(PODCAST_URLS):
-        transcribe_podcast(url, i)
+    transcribe_podcasts(PODCAST_URLS)
 
     # Wikipedia dumps
     for lang in LANGUAGES:
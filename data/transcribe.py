@@ -0,0 +1,139 @@
+# transcribe.py
+#
+# Whisper transcription worker. The model is loaded once per worker
+# process, long audio is split into CHUNK_SECONDS windows that are
+# transcribed in parallel, and finished transcripts (with segment
+# timestamps) are cached by audio hash so a file is only ever transcribed once.
+#
+#   python transcribe.py equinet_data/podcast.webm equinet_data/podcast_0.webm
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# ---------------------------
+# CONFIG
+# ---------------------------
+WHISPER_MODEL = "base"
+CACHE_DIR = "transcripts_cache"
+SAMPLE_RATE = 16000  # whisper's expected input rate
+CHUNK_SECONDS = 600  # audio window per job; long podcasts fan out across workers
+NUM_WORKERS = max(1, (os.cpu_count() or 1) // 2)
+THREADS_PER_WORKER = max(1, (os.cpu_count() or 1) // NUM_WORKERS)
+
+_model = None
+
+
+def _init_worker(model_name, threads):
+    global _model
+    import torch
+    import whisper
+    torch.set_num_threads(threads)
+    _model = whisper.load_model(model_name)
+
+
+def audio_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def audio_duration(path):
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+        capture_output=True, check=True, text=True
+    ).stdout.strip()
+    return float(out)
+
+
+def load_audio_window(path, start, duration):
+    """
+    Mono 16 kHz float32 samples for [start, start + duration) seconds,
+    decoded by ffmpeg (same format as whisper.load_audio).
+    """
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-ss", str(start), "-t", str(duration),
+           "-i", path, "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-"]
+    out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def _transcribe_window(job):
+    path, start, duration = job
+    audio = load_audio_window(path, start, duration)
+    result = _model.transcribe(audio, fp16=False)
+    segments = [
+        {"start": round(start + s["start"], 2), "end": round(start + s["end"], 2), "text": s["text"].strip()}
+        for s in result["segments"]
+    ]
+    return segments, result.get("language")
+
+
+def cache_path(sha, model_name):
+    return os.path.join(CACHE_DIR, f"{sha}.{model_name}.json")
+
+
+class TranscriptionWorker:
+    """
+    Transcribes a queue of local audio files on a process pool, reusing one
+    loaded Whisper model per process.
+    """
+
+    def __init__(self, model_name=WHISPER_MODEL, num_workers=NUM_WORKERS,
+                 threads_per_worker=THREADS_PER_WORKER, chunk_seconds=CHUNK_SECONDS):
+        self.model_name = model_name
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.chunk_seconds = chunk_seconds
+        os.makedirs(CACHE_DIR, exist_ok=True)
+
+    def transcribe_all(self, paths):
+        """
+        {path: {"text", "language", "segments", "duration"}} for every path.
+        Cached transcripts are returned without touching the model.
+        """
+        results, jobs, pending = {}, [], {}
+        for path in paths:
+            sha = audio_sha256(path)
+            cached = cache_path(sha, self.model_name)
+            if os.path.exists(cached):
+                with open(cached, "r", encoding="utf-8") as f:
+                    results[path] = json.load(f)
+                print(f"[INFO] Cached transcript: {path}")
+                continue
+            duration = audio_duration(path)
+            windows = [(path, start, min(self.chunk_seconds, duration - start))
+                       for start in np.arange(0, duration, self.chunk_seconds)]
+            pending[path] = (sha, duration, len(jobs), len(jobs) + len(windows))
+            jobs.extend(windows)
+
+        if jobs:
+            print(f"[INFO] Transcribing {len(pending)} files as {len(jobs)} windows on {self.num_workers} workers...")
+            with ProcessPoolExecutor(max_workers=self.num_workers, initializer=_init_worker,
+                                     initargs=(self.model_name, self.threads_per_worker)) as pool:
+                outputs = list(pool.map(_transcribe_window, jobs))
+
+            for path, (sha, duration, first, last) in pending.items():
+                segments = [s for segs, _ in outputs[first:last] for s in segs]
+                languages = [lang for _, lang in outputs[first:last] if lang]
+                transcript = {
+                    "text": " ".join(s["text"] for s in segments),
+                    "language": max(set(languages), key=languages.count) if languages else None,
+                    "segments": segments,
+                    "duration": duration,
+                    "model": self.model_name
+                }
+                with open(cache_path(sha, self.model_name), "w", encoding="utf-8") as f:
+                    json.dump(transcript, f, ensure_ascii=False)
+                results[path] = transcript
+        return results
+
+
+if __name__ == "__main__":
+    for path, transcript in TranscriptionWorker().transcribe_all(sys.argv[1:]).items():
+        print(f"[INFO] {path}: {len(transcript['segments'])} segments, {transcript['duration']:.0f}s")
@@ -1,57 +1,55 @@
 import json
-import faiss
 import numpy as np
-from tqdm import tqdm
+from index_builder import build_index, save_index, params_path
+from corpus_store import load_corpus
+from bm25 import BM25Index
 
 # ---------------------------
 # CONFIG
 # ---------------------------
-INPUT_FILE = "clustered_dataset.json"
+INPUT_BASE = "clustered_dataset"  # corpus_store base name
 FAISS_INDEX_FILE = "equinet_faiss.index"
 METADATA_FILE = "equinet_metadata.json"
+BM25_FILE = "equinet_bm25.npz"  # lexical index, rows aligned with the FAISS index
+INDEX_TYPE = "flat"  # "flat", "ivf", "ivfpq", "hnsw", or compressed "fp16" / "sq8" / "pq" (see index_builder.py)
+METRIC = "ip"  # "ip" = cosine over the unit vectors embed.py stores, or "l2"
+NPROBE = 8  # IVF lists searched per query
+EF_SEARCH = 64  # HNSW search breadth
 
 # ---------------------------
 # LOAD DATA
 # ---------------------------
 print("[INFO] Loading clustered dataset...")
-with open(INPUT_FILE, "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-embeddings = np.array([entry["embedding"] for entry in data], dtype='float32')
+data, embeddings = load_corpus(INPUT_BASE)
 print(f"[INFO] {len(embeddings)} embeddings loaded.")
 
 # ---------------------------
 # OPTIONAL: PRUNE LOW-FAIRNESS CLUSTERS
 # ---------------------------
-fairness_threshold = 0.5  # tune for your domain
-print(f"[INFO] Pruning embeddings with fairness score < {fairness_threshold}...")
-pruned_data = []
-pruned_embeddings = []
-
-for i, entry in enumerate(data):
-    if entry["fairness_score"] >= fairness_threshold:
-        pruned_data.append(entry)
-        pruned_embeddings.append(embeddings[i])
-
-embeddings = np.array(pruned_embeddings, dtype='float32')
-data = pruned_data
-print(f"[INFO] {len(embeddings)} embeddings remain after pruning.")
+# Off by default: the backend's fairness re-ranker (rerank on /query) applies
+# fairness at query time without dropping snippets from the index.
+fairness_threshold = None  # e.g. 0.5 to prune at build time
+if fairness_threshold is not None:
+    print(f"[INFO] Pruning embeddings with fairness score < {fairness_threshold}...")
+    keep = np.array([entry["fairness_score"] >= fairness_threshold for entry in data], dtype=bool)
+    embeddings = np.asarray(embeddings[keep], dtype='float32')
+    data = [entry for entry, kept in zip(data, keep) if kept]
+    print(f"[INFO] {len(embeddings)} embeddings remain after pruning.")
 
 # ---------------------------
 # BUILD FAISS INDEX
 # ---------------------------
-print("[INFO] Building FAISS index...")
-dimension = embeddings.shape[1]
-index = faiss.IndexFlatL2(dimension)  # L2 similarity; can switch to IndexFlatIP for cosine
-index.add(embeddings)
+print(f"[INFO] Building {INDEX_TYPE} ({METRIC}) FAISS index...")
+index, index_params = build_index(embeddings, INDEX_TYPE, nprobe=NPROBE, ef_search=EF_SEARCH,
+                                   metric=METRIC)
 
 print(f"[INFO] FAISS index built with {index.ntotal} vectors.")
 
 # ---------------------------
 # SAVE INDEX
 # ---------------------------
-faiss.write_index(index, FAISS_INDEX_FILE)
-print(f"[INFO] FAISS index saved to {FAISS_INDEX_FILE}.")
+save_index(index, index_params, FAISS_INDEX_FILE, vectors=embeddings)
+print(f"[INFO] FAISS index saved to {FAISS_INDEX_FILE} (search params in {params_path(FAISS_INDEX_FILE)}).")
 
 # ---------------------------
 # SAVE METADATA
@@ -72,4 +70,11 @@ with open(METADATA_FILE, "w", encoding="utf-8") as f:
     json.dump(metadata, f, indent=2, ensure_ascii=False)
 
 print(f"[INFO] Metadata saved to {METADATA_FILE}")
+
+# ---------------------------
+# BUILD BM25 INDEX
+# ---------------------------
+bm25 = BM25Index.build([entry.get("text", "") for entry in data])
+bm25.save(BM25_FILE)
+print(f"[INFO] BM25 index with {len(bm25.terms)} terms saved to {BM25_FILE}")
 print("[INFO] ✅ Fairness-weighted EquiNet vector database is ready.")
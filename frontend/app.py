@@ -1,33 +1,94 @@
 import streamlit as st
 import json
+import os
+import sys
 import numpy as np
 import faiss
 import plotly.express as px
 from sentence_transformers import SentenceTransformer
 from sklearn.manifold import TSNE
 from sklearn.preprocessing import StandardScaler
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+from embedding_cache import EmbeddingCache  # shared with the data pipeline
+from index_builder import load_params, normalizes_queries, normalize_rows, filtered_search
+
+MODEL_NAME = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+FAISS_INDEX_FILE = "faiss_index/equinet_faiss.index"
 
 # -------------------------------
 # Load data and model
 # -------------------------------
 @st.cache_resource
 def load_model():
-    return SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+    return SentenceTransformer(MODEL_NAME)
+
+@st.cache_resource
+def load_embedding_cache():
+    return EmbeddingCache(MODEL_NAME, "query-v1")
 
 @st.cache_resource
 def load_data():
     with open("faiss_index/embedded_dataset_aligned.json", "r", encoding="utf-8") as f:
         data = json.load(f)
-    embeddings = np.array([d["embedding"] for d in data]).astype("float32")
-    return data, embeddings
+    # Vectors are served by the index; don't keep a second float32 copy
+    for d in data:
+        d.pop("embedding", None)
+    return data
 
 @st.cache_resource
 def load_index():
-    return faiss.read_index("faiss_index/equinet_faiss.index")
+    index = faiss.read_index(FAISS_INDEX_FILE)
+    try:
+        faiss.extract_index_ivf(index).make_direct_map()  # IVF indexes need it for reconstruct
+    except RuntimeError:
+        pass
+    return index
+
+@st.cache_resource
+def load_index_params():
+    return load_params(FAISS_INDEX_FILE)
+
+def subset_vectors(index, idxs):
+    """
+    Vectors for the plotted rows, decoded from the index (approximate for
+    compressed index types, which is fine for a 2D plot).
+    """
+    return np.vstack([index.reconstruct(int(i)) for i in idxs])
+
+@st.cache_resource
+def load_facets(_data):
+    """
+    Row positions per source / voice group, for filtering inside the search.
+    """
+    facets = {"source": {}, "group": {}}
+    for i, d in enumerate(_data):
+        facets["source"].setdefault(d["source"], []).append(i)
+        facets["group"].setdefault(d["group"].lower(), []).append(i)
+    return {name: {v: np.array(rows, dtype=np.int64) for v, rows in values.items()}
+            for name, values in facets.items()}
+
+def filter_mask(facets, n, sources, group):
+    """
+    Boolean mask of rows matching the sidebar filters, or None when no
+    filter is active.
+    """
+    mask = None
+    if sources:
+        mask = np.zeros(n, dtype=bool)
+        for source in sources:
+            mask[facets["source"].get(source, [])] = True
+    if group != "All":
+        group_mask = np.zeros(n, dtype=bool)
+        group_mask[facets["group"].get(group.lower(), [])] = True
+        mask = group_mask if mask is None else mask & group_mask
+    return mask
 
 model = load_model()
-data, embeddings = load_data()
+embedding_cache = load_embedding_cache()
+data = load_data()
 index = load_index()
+index_params = load_index_params()
+facets = load_facets(data)
 
 # -------------------------------
 # Streamlit Page Config
@@ -85,15 +146,16 @@ st.write("Search across global and marginalized perspectives in sustainability,
 query = st.text_input("🔎 Enter your query:", placeholder="e.g., indigenous climate adaptation strategies in Asia")
 
 if query:
-    query_vec = model.encode([query])
-    D, I = index.search(np.array(query_vec).astype("float32"), 5)
-    results = [data[i] for i in I[0]]
-
-    # Apply filters
-    if source_filter:
-        results = [r for r in results if r["source"] in source_filter]
-    if group_filter != "All":
-        results = [r for r in results if r["group"].lower() == group_filter.lower()]
+    query_vec = embedding_cache.encode(model, [query], show_progress_bar=False)
+    if normalizes_queries(index_params):
+        query_vec = normalize_rows(query_vec)
+    # Filters are applied inside the search, so we always get up to 5 matches
+    mask = filter_mask(facets, len(data), source_filter, group_filter)
+    if mask is None:
+        D, I = index.search(query_vec, 5)
+    else:
+        D, I = filtered_search(index, index_params, query_vec, 5, mask)
+    results = [data[i] for i in I[0] if i >= 0]
 
     st.subheader("🧾 Top Results")
     for r in results:
@@ -114,7 +176,7 @@ if query:
         # Sample a small subset for plotting
         subset_size = 300
         idxs = np.random.choice(len(data), min(subset_size, len(data)), replace=False)
-        subset_emb = embeddings[idxs]
+        subset_emb = subset_vectors(index, idxs)
         subset_labels = [data[i]["group"] for i in idxs]
 
         # Add query embedding
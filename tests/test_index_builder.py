@@ -0,0 +1,60 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+from index_builder import build_index, cosine_scores, filtered_search, normalize_rows, supports_removal  # noqa: E402
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "ivfpq", "sq8", "fp16"])
+def test_live_vectors_find_themselves_after_removal(index_type):
+    rng = np.random.default_rng(0)
+    vectors = normalize_rows(rng.normal(size=(2000, 32)))
+    rows = np.arange(len(vectors), dtype=np.int64)
+    index, _ = build_index(vectors, index_type, ids=rows, nprobe=64)
+    assert supports_removal(index)
+
+    removed = rows[::4]
+    index.remove_ids(removed)
+    live = np.setdiff1d(rows, removed)
+    _, I = index.search(vectors[live], 1)
+    assert index.ntotal == len(live)
+    assert (I[:, 0] == live).mean() > 0.95
+
+
+def test_hnsw_does_not_support_removal():
+    vectors = normalize_rows(np.random.default_rng(0).normal(size=(200, 16)))
+    index, _ = build_index(vectors, "hnsw", ids=np.arange(200))
+    assert not supports_removal(index)
+
+
+@pytest.mark.parametrize("unit", [True, False])
+def test_l2_distances_become_cosine_scores(unit):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(300, 16)).astype("float32") * 3.5
+    if unit:
+        vectors = normalize_rows(vectors)
+    queries = rng.normal(size=(4, 16)).astype("float32")
+    if unit:
+        queries = normalize_rows(queries)
+    index, params = build_index(vectors, "flat", metric="l2")
+    assert params["unit_vectors"] == unit
+    D, I = index.search(queries, 5)
+    expected = normalize_rows(queries) @ normalize_rows(vectors).T
+    scores = cosine_scores(queries, D, I, params, index)
+    assert np.allclose(scores, np.take_along_axis(expected, I, axis=1), atol=1e-4)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "ivfpq", "hnsw", "pq"])
+def test_filtered_search_only_returns_masked_rows(index_type):
+    rng = np.random.default_rng(0)
+    vectors = normalize_rows(rng.normal(size=(2000, 32)))
+    index, params = build_index(vectors, index_type)
+    mask = np.zeros(len(vectors), dtype=bool)
+    mask[::3] = True
+    _, I = filtered_search(index, params, vectors[:10], 5, mask)
+    # pq post-filters an over-fetched candidate list, so a slot may stay empty
+    assert (I >= 0).mean() > 0.9
+    assert mask[I[I >= 0]].all()